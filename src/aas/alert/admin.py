@@ -14,9 +14,12 @@ from .models import (
 
 
 class NetworkSystemAdmin(admin.ModelAdmin):
-    list_display = ("name", "type")
-    search_fields = ("name",)
+    list_display = ("name", "type", "user")
+    search_fields = ("name", "user__username")
     list_filter = ("type",)
+    list_select_related = ("user",)
+
+    raw_id_fields = ("user",)
 
 
 class ObjectTypeAdmin(admin.ModelAdmin):
@@ -63,7 +66,7 @@ class ActiveStateListFilter(admin.SimpleListFilter):
             return queryset
 
         lookup_value = int(self.value())
-        return queryset.filter(active_state__isnull=not lookup_value)
+        return queryset.filter(is_active=bool(lookup_value))
 
 
 class AlertAdmin(admin.ModelAdmin):
@@ -96,21 +99,19 @@ class AlertAdmin(admin.ModelAdmin):
         "problem_type",
         "object__type",
     )
-    list_select_related = ("active_state",)
-
     raw_id_fields = ("object", "parent_object")
 
     def get_active_state(self, alert: Alert):
-        return hasattr(alert, "active_state")
+        return alert.is_active
 
     get_active_state.boolean = True
     get_active_state.short_description = "Active"
-    get_active_state.admin_order_field = "active_state"
+    get_active_state.admin_order_field = "is_active"
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         # Reduce number of database calls
-        return Alert.prefetch_related_fields(qs)
+        return Alert.load_related_fields(qs)
 
 
 class ActiveAlertAdmin(admin.ModelAdmin):
@@ -1,29 +1,49 @@
+import argparse
+import json
 import os
 import random
 import sys
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 from pathlib import Path
 from string import ascii_lowercase, ascii_uppercase, digits
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 import django
+from django.apps import apps
 from django.core import serializers
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
 from django.db.models import Model
 from django.utils import timezone
 
 FIXTURES_DIR = Path(__file__).resolve().parent
 ROOT_DIR = FIXTURES_DIR.parent.parent.parent.parent
 ALERT_FIXTURES_FILE = FIXTURES_DIR / "alert" / "mock_data.json"
+ALERT_JSONL_FIXTURES_FILE = FIXTURES_DIR / "alert" / "mock_data.jsonl"
 
 # Must be called before any models are imported, to be able to use them
-sys.path.append(ROOT_DIR)
+sys.path.append(str(ROOT_DIR / "src"))
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "aas.site.settings.dev")
 django.setup()
 
 from aas.alert.models import *
-
+from aas.alert.sources import network_system_table
+from aas.alert.utils import chunks
+from aas.auth.models import User
+from aas.notificationprofile.matchers import profile_index
+from aas.notificationprofile.models import (
+    FILTER_CRITERION_MODELS,
+    Filter,
+    NotificationProfile,
+    TimeInterval,
+    TimeSlot,
+)
 
 # --- Generation configuration ---
+SEED = 0
+# Max number of objects that are generated, serialized or created in the database at a time
+CHUNK_SIZE = 1000
 START_PK = 1
 MAX_ID = 999_999
 WORD_LENGTH_RANGE = (2, 10)
@@ -49,6 +69,16 @@ PROBLEM_TYPE_DESCRIPTION_WORD_COUNT_RANGE = (5, 20)
 NUM_ALERTS = 200
 ALERT_TIMESTAMP_NOW_CHANCE = 1 / 3
 ALERT_DESCRIPTION_WORD_COUNT_RANGE = (2, 10)
+ACTIVE_ALERT_CHANCE = 1 / 10
+# User:
+NUM_USERS = 10
+# TimeSlot:
+WORK_HOURS_TIME_SLOT_CHANCE = 1 / 2
+WORK_HOURS = (time(8), time(16))
+# Filter:
+FILTERS_PER_USER_RANGE = (1, 3)
+FILTER_SOURCE_COUNT_RANGE = (0, 2)
+FILTER_PROBLEM_TYPE_COUNT_RANGE = (0, 3)
 
 
 # --- Util functions ---
@@ -60,10 +90,12 @@ past_ids = set()
 
 
 def random_id() -> str:
-    id_ = random.randint(1, MAX_ID)
+    # Leave room for more IDs when generating more objects than `MAX_ID`
+    max_id = max(MAX_ID, 2 * len(past_ids))
+    id_ = random.randint(1, max_id)
     # Ensure unique IDs (note that this is across models; might want to change to check per model)
     while id_ in past_ids:
-        id_ = random.randint(1, MAX_ID)
+        id_ = random.randint(1, max_id)
 
     past_ids.add(id_)
     return str(id_)
@@ -89,10 +121,8 @@ def random_description(word_count_range: Tuple[int, int]) -> str:
     return description[0].upper() + description[1:] + "."
 
 
-def random_timestamp() -> datetime:
-    random_time_delta = (
-        timezone.now() - MIN_TIMESTAMP
-    ).total_seconds() * random.random()
+def random_timestamp(now: datetime) -> datetime:
+    random_time_delta = (now - MIN_TIMESTAMP).total_seconds() * random.random()
     return MIN_TIMESTAMP + timedelta(seconds=random_time_delta)
 
 
@@ -223,59 +253,366 @@ def generate_problem_types() -> List[Model]:
     return set_pks(problem_types)
 
 
-def generate_alerts(
-    network_systems, objects, parent_objects, problem_types
-) -> List[Model]:
+def iter_alerts(
+    network_systems,
+    objects,
+    parent_objects,
+    problem_types,
+    num_alerts=NUM_ALERTS,
+    now: Optional[datetime] = None,
+) -> Iterator[Model]:
+    now = now or timezone.now()
     second_delay = timedelta(seconds=1)
 
-    alerts = []
-    for i in range(NUM_ALERTS):
+    for i in range(num_alerts):
         if roll_dice(ALERT_TIMESTAMP_NOW_CHANCE):
             # Adds a small delay between each alert with a "now" timestamp
-            timestamp = timezone.now() + i * second_delay
+            timestamp = now + i * second_delay
         else:
-            timestamp = random_timestamp()
+            timestamp = random_timestamp(now)
 
         network_system = random.choice(network_systems)
         alert_id = random_id()
 
-        alerts.append(
-            Alert(
-                timestamp=timestamp,
-                source=network_system,
-                alert_id=alert_id,
-                object=random.choice(objects),
-                parent_object=random.choice(parent_objects),
-                details_url=format_url(network_system, alert_id),
-                problem_type=random.choice(problem_types),
-                description=random_description(ALERT_DESCRIPTION_WORD_COUNT_RANGE),
+        yield Alert(
+            pk=START_PK + i,
+            timestamp=timestamp,
+            source=network_system,
+            alert_id=alert_id,
+            object=random.choice(objects),
+            parent_object=random.choice(parent_objects),
+            details_url=format_url(network_system, alert_id),
+            problem_type=random.choice(problem_types),
+            description=random_description(ALERT_DESCRIPTION_WORD_COUNT_RANGE),
+        )
+
+
+def generate_active_alerts(alerts) -> List[Model]:
+    active_alerts = []
+    for alert in alerts:
+        if roll_dice(ACTIVE_ALERT_CHANCE):
+            alert.is_active = True
+            active_alerts.append(ActiveAlert(alert=alert))
+
+    return active_alerts
+
+
+def generate_users(num_users=NUM_USERS, now: Optional[datetime] = None) -> List[Model]:
+    now = now or timezone.now()
+    users = []
+    for i in range(num_users):
+        username = f"{random_word()}{i}"
+        users.append(
+            User(username=username, email=f"{username}@example.org", date_joined=now)
+        )
+
+    return set_pks(users)
+
+
+def generate_time_slots(users) -> Tuple[List[Model], List[Model]]:
+    time_slots = set_pks(
+        [
+            TimeSlot(
+                user=user,
+                name=(
+                    "Work hours" if roll_dice(WORK_HOURS_TIME_SLOT_CHANCE) else "Always"
+                ),
             )
+            for user in users
+        ]
+    )
+
+    time_intervals = []
+    for time_slot in time_slots:
+        if time_slot.name == "Work hours":
+            days = [day for day, _day_name in TimeInterval.DAY_CHOICES[:5]]
+            start, end = WORK_HOURS
+        else:
+            days = [day for day, _day_name in TimeInterval.DAY_CHOICES]
+            start, end = TimeInterval.DAY_START, TimeInterval.DAY_END
+
+        time_intervals.extend(
+            TimeInterval(time_slot=time_slot, day=day, start=start, end=end)
+            for day in days
         )
 
-    return set_pks(alerts)
+    return time_slots, set_pks(time_intervals)
+
+
+def generate_filters(users, network_systems, problem_types) -> List[Model]:
+    def random_pks(objects, count_range: Tuple[int, int]) -> List[int]:
+        return sorted(obj.pk for obj in random.sample(objects, random_int(count_range)))
+
+    filters = []
+    for user in users:
+        for i in range(random_int(FILTERS_PER_USER_RANGE)):
+            filter_json = {
+                "sourceIds": random_pks(network_systems, FILTER_SOURCE_COUNT_RANGE),
+                "objectTypeIds": [],
+                "parentObjectIds": [],
+                "problemTypeIds": random_pks(
+                    problem_types, FILTER_PROBLEM_TYPE_COUNT_RANGE
+                ),
+            }
+            filters.append(
+                Filter(
+                    user=user,
+                    name=f"Filter {i + 1}",
+                    filter_string=json.dumps(filter_json),
+                )
+            )
+
+    return set_pks(filters)
+
+
+def generate_filter_criteria(filters) -> List[Model]:
+    # The rows that `Filter.save()` writes from the filter strings, for creating the filters in bulk
+    filter_criteria = []
+    for filter_ in filters:
+        for filter_field_name, values in filter_.criteria.items():
+            criterion_model = FILTER_CRITERION_MODELS[filter_field_name]
+            filter_criteria.extend(
+                criterion_model(filter=filter_, value_id=value)
+                for value in sorted(values)
+            )
+
+    return filter_criteria
+
+
+def generate_notification_profiles(
+    time_slots, filters
+) -> Tuple[List[Model], List[Model]]:
+    filters_per_user_pk = {}
+    for filter_ in filters:
+        filters_per_user_pk.setdefault(filter_.user.pk, []).append(filter_)
 
+    notification_profiles = []
+    notification_profile_filters = []
+    for time_slot in time_slots:
+        notification_profile = NotificationProfile(
+            user=time_slot.user, time_slot=time_slot, media=[NotificationProfile.EMAIL]
+        )
+        notification_profiles.append(notification_profile)
+        notification_profile_filters.extend(
+            NotificationProfile.filters.through(
+                notificationprofile=notification_profile, filter=filter_
+            )
+            for filter_ in filters_per_user_pk.get(time_slot.user.pk, ())
+        )
+
+    return notification_profiles, notification_profile_filters
+
+
+def chunks_per_model(objs: Iterable[Model], chunk_size: int) -> Iterator[List[Model]]:
+    objs_per_model = {}
+    for obj in objs:
+        objs_per_model.setdefault(type(obj), []).append(obj)
+    for model_objs in objs_per_model.values():
+        yield from chunks(model_objs, chunk_size)
+
+
+def iter_dataset_chunks(
+    num_alerts=NUM_ALERTS,
+    num_users=0,
+    seed=SEED,
+    chunk_size=CHUNK_SIZE,
+    now: Optional[datetime] = None,
+) -> Iterator[List[Model]]:
+    """
+    Generates the objects of a dataset in chunks of objects of one model at a time,
+    where the objects only refer to objects of earlier chunks.
+    The alerts are generated one chunk at a time as they are consumed,
+    as they are the only objects that there are too many of to hold in memory.
+    The same seed generates the same objects, except for the timestamps, which are relative to `now`.
+    """
+    random.seed(seed)
+    past_ids.clear()
+    now = now or timezone.now()
 
-def create_fixture_file():
     network_systems = generate_network_systems(generate_network_system_types())
     object_types = generate_object_types()
     objects = generate_objects(object_types, network_systems)
     parent_objects = generate_parent_objects(network_systems)
     problem_types = generate_problem_types()
-    alerts = generate_alerts(network_systems, objects, parent_objects, problem_types)
-
-    all_objects = (
-        *network_systems,
-        *object_types,
-        *objects,
-        *parent_objects,
-        *problem_types,
-        *alerts,
+    yield from chunks_per_model(
+        (*network_systems, *object_types, *objects, *parent_objects, *problem_types),
+        chunk_size,
+    )
+
+    for alerts in chunks(
+        iter_alerts(
+            network_systems, objects, parent_objects, problem_types, num_alerts, now
+        ),
+        chunk_size,
+    ):
+        active_alerts = generate_active_alerts(alerts)
+        yield alerts
+        if active_alerts:
+            yield active_alerts
+
+    if num_users:
+        users = generate_users(num_users, now)
+        time_slots, time_intervals = generate_time_slots(users)
+        filters = generate_filters(users, network_systems, problem_types)
+        profiles, profile_filters = generate_notification_profiles(time_slots, filters)
+        yield from chunks_per_model(
+            (
+                *users,
+                *time_slots,
+                *time_intervals,
+                *filters,
+                *generate_filter_criteria(filters),
+                *profiles,
+                *profile_filters,
+            ),
+            chunk_size,
+        )
+
+
+def iter_records(dataset_chunks: Iterable[List[Model]]) -> Iterator[dict]:
+    for chunk in dataset_chunks:
+        # Only the concrete fields, as serializing the many-to-many fields would query the database
+        field_names = [field.name for field in type(chunk[0])._meta.local_fields]
+        yield from serializers.serialize("python", chunk, fields=field_names)
+
+
+def write_json_fixture(path: Path, dataset_chunks: Iterable[List[Model]]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w") as f:
+        f.write("[")
+        for i, record in enumerate(iter_records(dataset_chunks)):
+            if i > 0:
+                f.write(",\n")
+            json.dump(record, f, cls=DjangoJSONEncoder, ensure_ascii=False)
+        f.write("]\n")
+
+
+def write_jsonl_fixture(path: Path, dataset_chunks: Iterable[List[Model]]):
+    """
+    Writes one object per line, so that the file can be loaded a chunk at a time with `load_jsonl_fixture()`,
+    unlike a JSON fixture, which `loaddata` parses as a whole.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w") as f:
+        for record in iter_records(dataset_chunks):
+            f.write(json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False))
+            f.write("\n")
+
+
+def bulk_load(dataset_chunks: Iterable[List[Model]]):
+    """
+    Creates the objects directly in the database with `bulk_create()`, in one transaction.
+    Note that objects with the same pks must not exist already.
+    """
+    models = set()
+    with transaction.atomic():
+        for chunk in dataset_chunks:
+            model = type(chunk[0])
+            # Also limited by e.g. SQLite's max number of terms per query
+            batch_size = min(
+                CHUNK_SIZE,
+                connection.ops.bulk_batch_size(model._meta.concrete_fields, chunk),
+            )
+            model.objects.bulk_create(chunk, batch_size=batch_size)
+            models.add(model)
+
+        # The pks are set explicitly, which does not update the sequences of e.g. PostgreSQL
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+    # Creating objects in bulk does not send the signals that keep these up to date
+    network_system_table.mark_changed()
+    profile_index.invalidate()
+
+
+def model_obj_from_record(record: dict) -> Model:
+    # Faster than Django's deserializers, as the database backend converts the values when they are inserted
+    model = apps.get_model(record["model"])
+    return model(
+        pk=record["pk"],
+        **{
+            model._meta.get_field(field_name).attname: value
+            for field_name, value in record["fields"].items()
+        },
     )
 
-    ALERT_FIXTURES_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with ALERT_FIXTURES_FILE.open("w") as f:
-        serializers.serialize("json", all_objects, stream=f)
+
+def load_jsonl_fixture(path: Path, chunk_size=CHUNK_SIZE):
+    def iter_file_chunks():
+        with path.open() as f:
+            records = (json.loads(line) for line in f if line.strip())
+            for records_chunk in chunks(records, chunk_size):
+                yield from chunks_per_model(
+                    map(model_obj_from_record, records_chunk), chunk_size
+                )
+
+    bulk_load(iter_file_chunks())
+
+
+def create_fixture_file(
+    path: Path = ALERT_FIXTURES_FILE, jsonl=False, **dataset_kwargs
+):
+    dataset_chunks = iter_dataset_chunks(**dataset_kwargs)
+    if jsonl:
+        write_jsonl_fixture(path, dataset_chunks)
+    else:
+        write_json_fixture(path, dataset_chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generates mock data, and writes it to a fixture file or creates it directly in the database."
+    )
+    parser.add_argument(
+        "--format",
+        choices=("json", "jsonl", "db"),
+        default="json",
+        help="'json' writes a fixture for `loaddata`; 'jsonl' writes one object per line for `--load`;"
+        " 'db' creates the objects directly in the database. Defaults to 'json'.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help=f"Path of the fixture file. Defaults to {ALERT_FIXTURES_FILE} or {ALERT_JSONL_FIXTURES_FILE}.",
+    )
+    parser.add_argument(
+        "--load",
+        type=Path,
+        metavar="PATH",
+        help="Create the objects of a JSONL fixture file directly in the database, instead of generating any.",
+    )
+    parser.add_argument("--alerts", type=int, default=NUM_ALERTS)
+    parser.add_argument(
+        "--users",
+        type=int,
+        default=0,
+        help="Number of users to generate, each with a notification profile and filters. Defaults to 0,"
+        " as loading the fixture would replace any existing users with the same pks.",
+    )
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if args.load:
+        load_jsonl_fixture(args.load, args.chunk_size)
+        return
+
+    dataset_kwargs = {
+        "num_alerts": args.alerts,
+        "num_users": args.users,
+        "seed": args.seed,
+        "chunk_size": args.chunk_size,
+    }
+    if args.format == "db":
+        bulk_load(iter_dataset_chunks(**dataset_kwargs))
+    elif args.format == "jsonl":
+        create_fixture_file(
+            args.output or ALERT_JSONL_FIXTURES_FILE, jsonl=True, **dataset_kwargs
+        )
+    else:
+        create_fixture_file(args.output or ALERT_FIXTURES_FILE, **dataset_kwargs)
 
 
 if __name__ == "__main__":
-    create_fixture_file()
+    main()
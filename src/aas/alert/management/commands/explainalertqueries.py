@@ -0,0 +1,122 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from aas.alert.models import Alert
+from aas.notificationprofile.models import Filter
+
+# The indexes that were added for the ways alerts are ordered and filtered
+ALERT_QUERY_INDEX_NAMES = {
+    "alert_active_timestamp_idx",
+    "alert_timestamp_id_idx",
+    "alert_source_timestamp_idx",
+    "alert_problem_timestamp_idx",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints the database's query plans for the alert queries of filters, and for the active alerts,"
+        " optionally compared to the plans without the indexes added for alert queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--filter",
+            type=int,
+            action="append",
+            default=[],
+            dest="filter_pks",
+            metavar="PK",
+            help="Pk of a filter whose alert query to explain. Can be passed several times. Defaults to all filters.",
+        )
+        parser.add_argument(
+            "--filter-string",
+            action="append",
+            default=[],
+            dest="filter_strings",
+            help="Filter string of an unsaved filter whose alert query to explain, e.g. '{\"sourceIds\": [1], ...}'.",
+        )
+        parser.add_argument(
+            "--compare",
+            action="store_true",
+            help="Also print the query plans without the indexes added for alert queries."
+            " The indexes are dropped inside a transaction that is rolled back."
+            " WARNING: on PostgreSQL, this locks the alert table until the transaction is rolled back,"
+            " which blocks ingesting alerts; only use this on a test or development database."
+            " Refused unless DEBUG is enabled or --force is passed.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Allow --compare when DEBUG is not enabled.",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Execute the queries to include actual row counts and timings (PostgreSQL only).",
+        )
+
+    def handle(self, *args, **options):
+        explain_options = {"analyze": True} if options["analyze"] else {}
+        if explain_options and connection.vendor != "postgresql":
+            raise CommandError("--analyze is only supported on PostgreSQL.")
+
+        if options["compare"] and not (settings.DEBUG or options["force"]):
+            raise CommandError(
+                "--compare locks the alert table while the indexes are dropped, and should only be used"
+                " on a test or development database. Enable DEBUG or pass --force to run it anyway."
+            )
+
+        queries = self.get_queries(options["filter_pks"], options["filter_strings"])
+
+        plans_without_indexes = None
+        if options["compare"]:
+            with transaction.atomic():
+                self.drop_alert_query_indexes()
+                plans_without_indexes = [
+                    query.explain(**explain_options) for _name, query in queries
+                ]
+                transaction.set_rollback(True)
+            # Reconnect, as SQLite can otherwise reuse the plans of the prepared statements from above
+            connection.close()
+
+        plans = [query.explain(**explain_options) for _name, query in queries]
+
+        for i, (name, query) in enumerate(queries):
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(str(query.query))
+            if plans_without_indexes is not None:
+                self.stdout.write(self.style.MIGRATE_LABEL("Without indexes:"))
+                self.stdout.write(plans_without_indexes[i])
+                self.stdout.write(self.style.MIGRATE_LABEL("With indexes:"))
+            self.stdout.write(plans[i])
+            self.stdout.write("")
+
+    @staticmethod
+    def get_queries(filter_pks, filter_strings):
+        filters = Filter.objects.all()
+        if filter_pks:
+            filters = filters.filter(pk__in=filter_pks)
+        filters = list(filters)
+        filters.extend(
+            Filter(name="Unsaved filter", filter_string=filter_string)
+            for filter_string in filter_strings
+        )
+
+        queries = [("Active alerts", Alert.get_active_alerts())]
+        for filter_ in filters:
+            name = (
+                f"Filter {filter_.pk}: {filter_.name}" if filter_.pk else filter_.name
+            )
+            queries.append((name, Alert.objects.filter(filter_.get_alert_query())))
+        return queries
+
+    @staticmethod
+    def drop_alert_query_indexes():
+        # Not using the schema editor as a context manager, as that is not supported inside transactions on SQLite
+        schema_editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for index in Alert._meta.indexes:
+                if index.name in ALERT_QUERY_INDEX_NAMES:
+                    cursor.execute(str(index.remove_sql(Alert, schema_editor)))
@@ -0,0 +1,362 @@
+import json
+import math
+import random
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from aas.alert.models import Alert, NetworkSystem
+from aas.auth.models import User
+from aas.notificationprofile.models import Filter, NotificationJob
+from aas.notificationprofile.notification_queue import (
+    enqueue_notifications,
+    run_worker,
+)
+
+BENCHMARK_NAMES = (
+    "alert_list_post",
+    "process_notification_jobs",
+    "process_notification_jobs_in_bulk",
+    "active_alert_list",
+    "filter_preview",
+)
+
+BENCHMARK_SETTINGS = {
+    # Notifications are "sent" to memory, and the test client's requests must be allowed
+    "EMAIL_BACKEND": "django.core.mail.backends.locmem.EmailBackend",
+    "ALLOWED_HOSTS": ["testserver"],
+    # Notifications are sent as soon as the notification jobs are processed
+    "NOTIFICATION_DIGEST_WINDOW": 0,
+    # Otherwise, every executed query is kept in memory
+    "DEBUG": False,
+}
+
+
+def percentile(sorted_values: list, percent: float):
+    # Nearest-rank method
+    index = max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a dataset of the given size, and measures the throughput and latency of ingesting alerts,"
+        " sending notifications, listing active alerts and previewing filters."
+        " The results are stored as JSON, to be able to compare them across commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--alerts",
+            type=int,
+            default=1000,
+            help="Number of alerts to generate. Defaults to 1000.",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=100,
+            help="Number of users to generate, each with a notification profile and filters. Defaults to 100.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=100,
+            help="Number of measured operations per benchmark. Defaults to 100.",
+        )
+        parser.add_argument(
+            "--bulk-size",
+            type=int,
+            default=100,
+            help="Number of alerts per operation of the bulk benchmarks,"
+            " and number of notification jobs processed per batch. Defaults to 100.",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed of the generated dataset and of the benchmarks' random choices. Defaults to 0.",
+        )
+        parser.add_argument(
+            "--benchmark",
+            action="append",
+            choices=BENCHMARK_NAMES,
+            default=[],
+            dest="benchmarks",
+            help="Name of a benchmark to run. Can be passed several times. Defaults to all benchmarks.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Path of the JSON file to store the results in."
+            " Defaults to benchmark-results/<timestamp>-<commit>.json.",
+        )
+        parser.add_argument(
+            "--compare",
+            metavar="PATH",
+            help="Path of a JSON file with earlier results, to print the change in latency compared to them.",
+        )
+        parser.add_argument(
+            "--no-test-database",
+            action="store_false",
+            dest="test_database",
+            help="Generate the dataset in the configured database, instead of in a temporary test database."
+            " Only use this with an empty database.",
+        )
+
+    def handle(self, *args, **options):
+        # Imported here, as the module sets up Django when imported
+        from aas.alert.fixtures import generate_fixtures
+
+        if options["alerts"] < 1 or options["users"] < 1 or options["requests"] < 1:
+            raise CommandError("--alerts, --users and --requests must be positive.")
+
+        previous_results = None
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                previous_results = json.load(f)
+
+        old_database_name = None
+        if options["test_database"]:
+            old_database_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+        try:
+            with override_settings(**BENCHMARK_SETTINGS):
+                self.stdout.write("Generating dataset...")
+                started = time.perf_counter()
+                dataset = self.load_dataset(generate_fixtures, options)
+                load_seconds = time.perf_counter() - started
+
+                random.seed(options["seed"])
+                results = {}
+                for name in options["benchmarks"] or BENCHMARK_NAMES:
+                    self.stdout.write(f"Running {name}...")
+                    results[name] = getattr(self, f"benchmark_{name}")(dataset, options)
+                    mail.outbox = []
+        finally:
+            if old_database_name is not None:
+                connection.creation.destroy_test_db(old_database_name, verbosity=0)
+
+        report = {
+            "commit": get_git_commit(),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "database": connection.vendor,
+            "parameters": {
+                name: options[name]
+                for name in ("alerts", "users", "requests", "bulk_size", "seed")
+            },
+            "load_seconds": round(load_seconds, 3),
+            "results": results,
+        }
+        output_path = Path(options["output"] or self.get_default_output_path(report))
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with output_path.open("w") as f:
+            json.dump(report, f, indent=2)
+
+        self.print_report(report, previous_results)
+        self.stdout.write(f"Results stored in {output_path}")
+
+    @staticmethod
+    def get_default_output_path(report: dict):
+        timestamp = report["created"].replace(":", "")
+        commit = (report["commit"] or "unknown")[:12]
+        return Path("benchmark-results") / f"{timestamp}-{commit}.json"
+
+    @staticmethod
+    def load_dataset(generate_fixtures, options):
+        generate_fixtures.bulk_load(
+            generate_fixtures.iter_dataset_chunks(
+                num_alerts=options["alerts"],
+                num_users=options["users"],
+                seed=options["seed"],
+            )
+        )
+        users = list(User.objects.order_by("pk"))
+
+        # The alerts are posted by a NAV instance
+        nav_user = User.objects.create(username="benchmark-nav")
+        nav = NetworkSystem.objects.filter(type=NetworkSystem.NAV).earliest("pk")
+        nav.user = nav_user
+        nav.save()
+
+        return {
+            "alert_pks": list(
+                Alert.objects.order_by("pk").values_list("pk", flat=True)
+            ),
+            "users": users,
+            "filters": list(Filter.objects.select_related("user").order_by("pk")),
+            "nav_user": nav_user,
+        }
+
+    def measure(self, operation, operations: int, items_per_operation=1):
+        latencies = []
+        for i in range(operations):
+            started = time.perf_counter()
+            operation(i)
+            latencies.append(time.perf_counter() - started)
+
+        total_seconds = sum(latencies)
+        latencies.sort()
+        return {
+            "operations": operations,
+            "items": operations * items_per_operation,
+            "total_seconds": round(total_seconds, 6),
+            "operations_per_second": round(operations / total_seconds, 3),
+            "items_per_second": round(
+                operations * items_per_operation / total_seconds, 3
+            ),
+            "mean_ms": round(total_seconds / operations * 1000, 3),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        }
+
+    def benchmark_alert_list_post(self, dataset, options):
+        client = APIClient()
+        client.force_authenticate(user=dataset["nav_user"])
+        # Larger than the IDs of the generated alerts
+        first_history = 10**12
+
+        def post_alert(i):
+            history = first_history + i
+            netbox = i % 100 + 1
+            alert_json = {
+                "id": history,
+                "history": history,
+                "time": datetime.now().isoformat(),
+                "message": f"box down example-sw{netbox}.example.org",
+                "source": "pping",
+                "state": "s",
+                "on_maintenance": False,
+                "netbox": netbox,
+                "device_groups": None,
+                "device": None,
+                "subid": "",
+                "subject_type": "Netbox",
+                "subject": f"example-sw{netbox}.example.org",
+                "subject_url": f"/api/v1/ipdevinfo/example-sw{netbox}.example.org/",
+                "alert_details_url": f"/api/v1/alerts/{history}/",
+                "netbox_history_url": f"/api/v1/devicehistory/history/%3Fnetbox={netbox}",
+                "event_history_url": "/api/v1/devicehistory/history/?eventtype=e_boxState",
+                "event_type": {
+                    "description": "Tells us whether a network-unit is down or up.",
+                    "id": "boxState",
+                },
+                "alert_type": {"description": "Box declared down.", "name": "boxDown"},
+                "severity": 50,
+                "value": 100,
+            }
+            response = client.post(
+                "/api/v1/alerts/", json.dumps(alert_json), content_type="text/plain"
+            )
+            self.check_response(response, 200)
+
+        return self.measure(post_alert, options["requests"])
+
+    def benchmark_process_notification_jobs(self, dataset, options):
+        alerts = list(
+            Alert.objects.filter(
+                pk__in=random.sample(
+                    dataset["alert_pks"],
+                    min(options["requests"], len(dataset["alert_pks"])),
+                )
+            )
+        )
+        # E.g. the notification jobs of the alerts posted by the other benchmarks
+        NotificationJob.objects.all().delete()
+
+        def process_notification_jobs(i):
+            enqueue_notifications([alerts[i % len(alerts)]])
+            self.process_notification_queue(options)
+
+        return self.measure(process_notification_jobs, options["requests"])
+
+    def benchmark_process_notification_jobs_in_bulk(self, dataset, options):
+        bulk_size = min(options["bulk_size"], len(dataset["alert_pks"]))
+        NotificationJob.objects.all().delete()
+
+        def process_notification_jobs(i):
+            enqueue_notifications(
+                Alert.objects.filter(
+                    pk__in=random.sample(dataset["alert_pks"], bulk_size)
+                )
+            )
+            self.process_notification_queue(options)
+
+        return self.measure(process_notification_jobs, options["requests"], bulk_size)
+
+    @staticmethod
+    def process_notification_queue(options):
+        # The alerts are matched against the notification profiles by the first batches of jobs,
+        # and the notifications are sent by the sending jobs that these create
+        run_worker(
+            batch_size=options["bulk_size"], poll_interval=0, stop_when_empty=True
+        )
+
+    def benchmark_active_alert_list(self, dataset, options):
+        client = APIClient()
+
+        def list_active_alerts(i):
+            client.force_authenticate(user=random.choice(dataset["users"]))
+            self.check_response(client.get("/api/v1/alerts/active/"), 200)
+
+        return self.measure(list_active_alerts, options["requests"])
+
+    def benchmark_filter_preview(self, dataset, options):
+        client = APIClient()
+
+        def preview_filter(i):
+            filter_ = random.choice(dataset["filters"])
+            client.force_authenticate(user=filter_.user)
+            response = client.post(
+                "/api/v1/notificationprofiles/filterpreview/",
+                filter_.filter_json,
+                format="json",
+            )
+            self.check_response(response, 200)
+
+        return self.measure(preview_filter, options["requests"])
+
+    @staticmethod
+    def check_response(response, status_code: int):
+        if response.status_code != status_code:
+            raise CommandError(
+                f"Expected status code {status_code}, but got {response.status_code}: {response.content[:1000]}"
+            )
+
+    def print_report(self, report: dict, previous_report: dict = None):
+        previous_results = (previous_report or {}).get("results", {})
+        for name, result in report["results"].items():
+            line = (
+                f"{name}: {result['operations_per_second']} ops/s, {result['items_per_second']} items/s,"
+                f" p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms"
+            )
+            previous_result = previous_results.get(name)
+            if previous_result:
+                changes = ", ".join(
+                    f"{key[:3]} {(result[key] / previous_result[key] - 1) * 100:+.1f}%"
+                    for key in ("p50_ms", "p99_ms")
+                    if previous_result.get(key)
+                )
+                line += f" ({changes} compared to {previous_report.get('commit') or 'earlier results'})"
+            self.stdout.write(line)
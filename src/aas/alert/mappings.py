@@ -1,12 +1,26 @@
-import random
-from typing import Tuple, Type, Union
-
-from django.db import IntegrityError, models
+from itertools import product
+from operator import itemgetter
+from typing import Any, Callable, List, Tuple, Type, Union
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from .models import Alert, NetworkSystem, Object, ObjectType, ParentObject, ProblemType
-from .utils import MappingUtils
+from .utils import LRUCache, MappingUtils, chunks
+
+# Raised when mapping a posted dict that can't be mapped to an alert, e.g. because a value is invalid (`ValidationError`),
+# a key is missing (`KeyError`), or the dict or one of its nested values is not a dict (`TypeError`)
+MAPPING_ERRORS = (ValidationError, KeyError, TypeError)
+
+# Number of distinct rows to look up per query, to stay well below the query parameter
+# and expression depth limits of SQLite
+LOOKUP_BATCH_SIZE = 100
 
 
 # TODO: move to tests
@@ -15,10 +29,10 @@ def validate_field_mappings(model: Type[models.Model], field_mappings: dict):
         if not hasattr(model, field_name):
             raise ValueError(f"{model} has no attribute '{field_name}'")
 
-        if type(field_value_getter) is PassthroughField:
+        if type(field_value_getter) in {PassthroughField, ConstantField}:
             if model._meta.get_field(field_name).is_relation:
                 raise ValueError(
-                    f"The field {field_name} is a relational field and cannot be paired up with a PassthroughField."
+                    f"The field {field_name} is a relational field and cannot be paired up with a {type(field_value_getter).__name__}."
                 )
         elif type(field_value_getter) is ForeignKeyField:
             if not model._meta.get_field(field_name).is_relation:
@@ -45,6 +59,25 @@ class NestedKey:
             value = value[key]
         return value
 
+    def compile(self) -> Callable[[dict], Any]:
+        """
+        Returns a function that gets the value of the key from a nested dict, as a chain of `itemgetter`s.
+        """
+        get_value = itemgetter(self.super_keys[0])
+        for key in self.super_keys[1:]:
+            get_value = _chain_getters(get_value, itemgetter(key))
+        return get_value
+
+
+def _chain_getters(get_outer_value: Callable, get_inner_value: Callable):
+    return lambda dict_: get_inner_value(get_outer_value(dict_))
+
+
+def compile_key_getter(key_name: Union[str, NestedKey]) -> Callable[[dict], Any]:
+    if type(key_name) is NestedKey:
+        return key_name.compile()
+    return itemgetter(key_name)
+
 
 class Choose:
     def __init__(
@@ -67,6 +100,14 @@ class Choose:
 
         return self.arg if value in self.is_one_of else self.else_arg
 
+    def compile(self) -> Callable[[dict], bool]:
+        """
+        Returns a function that returns whether `arg` (and not `else_arg`) should be chosen for a dict.
+        """
+        get_value = compile_key_getter(self.if_value_of)
+        is_one_of = self.is_one_of
+        return lambda dict_: get_value(dict_) in is_one_of
+
 
 class FieldValueGetter:
     def prepare(self, field_name: str, model_for_field: Type[models.Model]):
@@ -78,25 +119,129 @@ class FieldValueGetter:
     def get_value_from_dict(self, json_dict: dict):
         pass
 
+    def get_values_from_dicts(self, json_dicts: List[dict]) -> list:
+        return [self.get_value_from_dict(json_dict) for json_dict in json_dicts]
+
+    def compile(self) -> Callable[[dict], Any]:
+        """
+        Returns a function that gets the field value from a dict. Must be called after `prepare()`.
+        """
+        return self.get_value_from_dict
+
 
 class PassthroughField(FieldValueGetter):
     def __init__(self, key_name: Union[str, NestedKey]):
         self.key_name = key_name
         self.none_value = None
+        self.field = None
+        self.coerce = None
+        self._get_value = None
 
     def prepare(self, field_name, model_for_field):
         field = model_for_field._meta.get_field(field_name)
-        if isinstance(field, (models.CharField, models.TextField)) and not field.null:
-            self.none_value = ""
+        self.none_value = get_none_value(field)
+        self.field = field
+        self.coerce = compile_coercer(field, self.none_value)
+        get_raw_value = compile_key_getter(self.key_name)
+        coerce = self.coerce
+        self._get_value = lambda json_dict: coerce(get_raw_value(json_dict))
 
     def get_value_from_dict(self, json_dict):
-        if type(self.key_name) is NestedKey:
-            return self.key_name.get_value_from(json_dict)
-        else:
-            return json_dict[self.key_name]
+        return self._get_value(json_dict)
+
+    def get_values_from_dicts(self, json_dicts):
+        return list(map(self._get_value, json_dicts))
+
+    def compile(self):
+        return self._get_value
+
+
+class ConstantField(FieldValueGetter):
+    """
+    Sets the same value for all alerts, for values that the network system does not send,
+    as they're implied by the structure of its alerts (e.g. the type of an object).
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def prepare(self, field_name, model_for_field):
+        field = model_for_field._meta.get_field(field_name)
+        self.value = compile_coercer(field, get_none_value(field))(self.value)
+
+    def get_value_from_dict(self, json_dict):
+        return self.value
+
+    def get_values_from_dicts(self, json_dicts):
+        return [self.value] * len(json_dicts)
+
+    def compile(self):
+        value = self.value
+        return lambda json_dict: value
+
+
+def get_none_value(field: models.Field):
+    # Non-nullable text fields are blank instead of null
+    if isinstance(field, (models.CharField, models.TextField)) and not field.null:
+        return ""
+    return None
+
+
+def compile_coercer(field: models.Field, none_value=None) -> Callable[[Any], Any]:
+    """
+    Returns a function that converts a value to the value that the field would have after saving and re-fetching the object
+    (e.g. a timestamp str to an aware datetime, or an int ID to a CharField's str),
+    so that created objects don't have to be re-fetched, and can be compared with fetched objects.
+    The checks of the field's type are done once here, instead of for every value.
+    """
+    to_python = field.to_python
+
+    def to_field_value(value):
+        try:
+            return to_python(value)
+        except DjangoValidationError as e:
+            raise ValidationError({field.name: e.messages})
+
+    if isinstance(field, models.DateTimeField) and settings.USE_TZ:
+        default_timezone = timezone.get_default_timezone()
+
+        def coerce(value):
+            if value is None:
+                return none_value
+            value = to_field_value(value)
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value, default_timezone)
+            return value
+
+    elif isinstance(field, models.URLField):
+
+        def coerce(value):
+            if value is None:
+                return none_value
+            return to_field_value(value).strip()
+
+    elif isinstance(field, (models.CharField, models.TextField)):
+
+        def coerce(value):
+            if value is None:
+                return none_value
+            # Skip the conversion of values that already are strs, which is the most common case
+            return value if type(value) is str else to_field_value(value)
+
+    else:
+
+        def coerce(value):
+            if value is None:
+                return none_value
+            return to_field_value(value)
+
+    return coerce
 
 
 class ForeignKeyField(FieldValueGetter):
+    # Caches of foreign model objects by their mapped field values; shared by all fields with the same foreign model
+    _caches = {}
+
     def __init__(
         self, foreign_model: Type[models.Model], foreign_model_field_mappings: dict
     ):
@@ -106,22 +251,173 @@ class ForeignKeyField(FieldValueGetter):
 
         self.foreign_model = foreign_model
         self.foreign_model_field_mappings = foreign_model_field_mappings
+        # Loaded together with the fetched objects, so that they're available without extra queries
+        self.related_field_names = [
+            field_name
+            for field_name, field_value_getter in foreign_model_field_mappings.items()
+            if type(field_value_getter) is ForeignKeyField
+        ]
+        self.cache = self.get_cache(foreign_model)
+        self._field_value_getters = ()
+
+    @classmethod
+    def get_cache(cls, foreign_model: Type[models.Model]) -> LRUCache:
+        if foreign_model not in cls._caches:
+            cls._caches[foreign_model] = LRUCache(
+                getattr(settings, "ALERT_FOREIGN_KEY_CACHE_SIZE", 1000),
+                get_index_key=lambda obj: obj.pk,
+            )
+            post_save.connect(_remove_cached_obj, sender=foreign_model)
+            post_delete.connect(_remove_cached_obj, sender=foreign_model)
+        return cls._caches[foreign_model]
+
+    @classmethod
+    def get_cache_stats(cls):
+        return {
+            foreign_model._meta.label: cache.stats
+            for foreign_model, cache in cls._caches.items()
+        }
+
+    @classmethod
+    def clear_caches(cls):
+        for cache in cls._caches.values():
+            cache.clear()
 
     def prepare(self, field_name, model_for_field):
         MappingUtils.prepare_field_value_getters(
             self.foreign_model, self.foreign_model_field_mappings
         )
+        self._field_value_getters = tuple(
+            field_value_getter.compile()
+            for field_value_getter in self.foreign_model_field_mappings.values()
+        )
 
     def get_value_from_dict(self, json_dict):
-        foreign_model_obj_kwargs = {
-            field_name: field_value_getter.get_value_from_dict(json_dict)
-            for field_name, field_value_getter in self.foreign_model_field_mappings.items()
-        }
-        foreign_model_obj, _created = self.foreign_model.objects.get_or_create(
-            **foreign_model_obj_kwargs
+        kwargs_tuple = tuple(
+            get_value(json_dict) for get_value in self._field_value_getters
         )
+        lookup_key = self._get_lookup_key(kwargs_tuple)
+        foreign_model_obj = self.cache.get(lookup_key)
+        if foreign_model_obj is None:
+            foreign_model_obj, _created = self.foreign_model.objects.get_or_create(
+                **self._get_kwargs(kwargs_tuple)
+            )
+            self._cache_obj(lookup_key, foreign_model_obj)
         return foreign_model_obj
 
+    def get_values_from_dicts(self, json_dicts):
+        # Resolve each field for all the dicts at once, so that nested foreign keys are also resolved in bulk
+        field_value_lists = [
+            field_value_getter.get_values_from_dicts(json_dicts)
+            for field_value_getter in self.foreign_model_field_mappings.values()
+        ]
+        kwargs_tuples = list(zip(*field_value_lists))
+
+        foreign_model_objs = {}
+        uncached_kwargs_tuples = []
+        for kwargs_tuple in set(kwargs_tuples):
+            lookup_key = self._get_lookup_key(kwargs_tuple)
+            foreign_model_obj = self.cache.get(lookup_key)
+            if foreign_model_obj is None:
+                uncached_kwargs_tuples.append(kwargs_tuple)
+            else:
+                foreign_model_objs[lookup_key] = foreign_model_obj
+
+        existing_objs = self._get_existing_objs(uncached_kwargs_tuples)
+        for lookup_key, foreign_model_obj in existing_objs.items():
+            self._cache_obj(lookup_key, foreign_model_obj)
+        foreign_model_objs.update(existing_objs)
+
+        missing_kwargs_tuples = [
+            kwargs_tuple
+            for kwargs_tuple in uncached_kwargs_tuples
+            if self._get_lookup_key(kwargs_tuple) not in existing_objs
+        ]
+        if missing_kwargs_tuples:
+            created_objs = self._create_objs(missing_kwargs_tuples)
+            for lookup_key, foreign_model_obj in created_objs.items():
+                self._cache_obj(lookup_key, foreign_model_obj)
+            foreign_model_objs.update(created_objs)
+
+        return [
+            foreign_model_objs[self._get_lookup_key(kwargs_tuple)]
+            for kwargs_tuple in kwargs_tuples
+        ]
+
+    def _get_existing_objs(self, kwargs_tuples) -> dict:
+        attnames = tuple(
+            self.foreign_model._meta.get_field(field_name).attname
+            for field_name in self.foreign_model_field_mappings
+        )
+        existing_objs = {}
+        for kwargs_tuples_chunk in chunks(kwargs_tuples, LOOKUP_BATCH_SIZE):
+            query = Q()
+            for kwargs_tuple in kwargs_tuples_chunk:
+                query |= Q(**self._get_kwargs(kwargs_tuple))
+            for obj in self.foreign_model.objects.select_related(
+                *self.related_field_names
+            ).filter(query):
+                lookup_key = self._get_lookup_key(
+                    tuple(getattr(obj, attname) for attname in attnames)
+                )
+                existing_objs[lookup_key] = obj
+        return existing_objs
+
+    def _create_objs(self, kwargs_tuples: list) -> dict:
+        objs = [
+            self.foreign_model(**self._get_kwargs(kwargs_tuple))
+            for kwargs_tuple in kwargs_tuples
+        ]
+        try:
+            with transaction.atomic():
+                self.foreign_model.objects.bulk_create(objs)
+        except IntegrityError:
+            # Some of the objects were probably created concurrently; fall back to creating them one by one
+            objs = [
+                self.foreign_model.objects.get_or_create(
+                    **self._get_kwargs(kwargs_tuple)
+                )[0]
+                for kwargs_tuple in kwargs_tuples
+            ]
+
+        if any(obj.pk is None for obj in objs):
+            # The database backend does not return the primary keys of bulk inserted rows
+            return self._get_existing_objs(kwargs_tuples)
+        return {
+            self._get_lookup_key(kwargs_tuple): obj
+            for kwargs_tuple, obj in zip(kwargs_tuples, objs)
+        }
+
+    def _cache_obj(self, lookup_key: tuple, obj: models.Model):
+        # Avoid caching an object that will not exist if the current transaction is rolled back;
+        # also objects that were looked up, as they might have been created earlier in the same transaction.
+        # Outside of a transaction, the object is cached right away
+        transaction.on_commit(lambda: self.cache.put(lookup_key, obj))
+
+    def _get_kwargs(self, kwargs_tuple: tuple):
+        return dict(zip(self.foreign_model_field_mappings, kwargs_tuple))
+
+    def _get_lookup_key(self, kwargs_tuple: tuple):
+        # Related objects are compared by their primary keys, like the attnames of fetched objects
+        return tuple(
+            (field_name, value.pk if isinstance(value, models.Model) else value)
+            for field_name, value in zip(
+                self.foreign_model_field_mappings, kwargs_tuple
+            )
+        )
+
+
+def _remove_cached_obj(sender, instance, **kwargs):
+    ForeignKeyField.get_cache(sender).remove_indexed(instance.pk)
+
+
+def _clear_cached_objs(sender, **kwargs):
+    # The database might have been flushed, which does not send any delete signals
+    ForeignKeyField.clear_caches()
+
+
+post_migrate.connect(_clear_cached_objs, dispatch_uid="clear_foreign_key_caches")
+
 
 class FieldMapping:
     def __init__(
@@ -144,27 +440,58 @@ class FieldMapping:
         self.network_system_type = network_system_type
         self.base_field_mappings = base_field_mappings
         self.conditional_field_mappings = conditional_field_mappings
+        self.get_field_mappings = self.compile()
 
-    def create_model_obj_from_json(self, json_dict: dict):
-        field_mappings = dict(self.base_field_mappings)  # copy dict
-        for choice in self.conditional_field_mappings:
-            field_mappings.update(choice.based_on(json_dict))
+    def compile(self) -> Callable[[dict], tuple]:
+        """
+        Returns a function that returns the field mappings that apply to a dict,
+        as a tuple of `(field_name, field_value_getter, compiled_field_value_getter)` tuples.
+        The field mappings of every combination of choices are merged here,
+        so that only the conditions of the choices have to be evaluated for each dict.
+        """
+        field_mappings_per_choices = {}
+        for choices in product(
+            (True, False), repeat=len(self.conditional_field_mappings)
+        ):
+            field_mappings = dict(self.base_field_mappings)
+            for choice, chose_arg in zip(self.conditional_field_mappings, choices):
+                field_mappings.update(choice.arg if chose_arg else choice.else_arg)
+            field_mappings_per_choices[choices] = tuple(
+                (field_name, field_value_getter, field_value_getter.compile())
+                for field_name, field_value_getter in field_mappings.items()
+            )
 
+        conditions = tuple(
+            choice.compile() for choice in self.conditional_field_mappings
+        )
+        if not conditions:
+            field_mappings = field_mappings_per_choices[()]
+            return lambda json_dict: field_mappings
+        if len(conditions) == 1:
+            (condition,) = conditions
+            field_mappings_per_choice = {
+                choices[0]: field_mappings
+                for choices, field_mappings in field_mappings_per_choices.items()
+            }
+            return lambda json_dict: field_mappings_per_choice[condition(json_dict)]
+        return lambda json_dict: field_mappings_per_choices[
+            tuple(condition(json_dict) for condition in conditions)
+        ]
+
+    def create_model_obj_from_json(self, json_dict: dict, source: NetworkSystem):
         alert_kwargs = {
-            field_name: field_value_getter.get_value_from_dict(json_dict)
-            for field_name, field_value_getter in field_mappings.items()
+            field_name: get_value(json_dict)
+            for field_name, _field_value_getter, get_value in self.get_field_mappings(
+                json_dict
+            )
         }
-
-        # TODO: remove once source is saved from posted alerts
-        alert_kwargs["source"] = random.choice(
-            NetworkSystem.objects.filter(type=self.network_system_type)
-        )
+        alert_kwargs["source"] = source
 
         try:
             alert = Alert.objects.create(**alert_kwargs)
         except IntegrityError as e:
             alert_id = alert_kwargs["alert_id"]
-            if Alert.objects.filter(alert_id=alert_id).exists():
+            if Alert.objects.filter(alert_id=alert_id, source=source).exists():
                 raise ValidationError(
                     f"Alert with the alert_id '{alert_id}' already exists for"
                     f" the NetworkSystem '{alert_kwargs['source']}'."
@@ -172,16 +499,146 @@ class FieldMapping:
             else:
                 raise e
 
-        # Re-fetch the alert to get parsed field values (e.g. replace timestamp str with datetime)
-        alert = Alert.objects.get(pk=alert.pk)
         return alert
 
+    def create_model_objs_from_json(
+        self, json_dicts: List[dict], source: NetworkSystem
+    ):
+        if not json_dicts:
+            return []
+
+        alerts = self.get_model_objs_from_json(json_dicts, source)
+        try:
+            with transaction.atomic():
+                Alert.objects.bulk_create(alerts)
+        except IntegrityError as e:
+            existing_alert_ids = self._get_existing_alert_ids(alerts)
+            if existing_alert_ids:
+                raise ValidationError(
+                    f"Alerts with the alert_ids {sorted(existing_alert_ids)} already exist"
+                    f" for their NetworkSystems."
+                )
+            else:
+                raise e
+
+        if any(alert.pk is None for alert in alerts):
+            self._set_pks(alerts)
+        return alerts
+
+    def create_model_objs_from_json_ignoring_duplicates(
+        self, json_dicts: List[dict], source: NetworkSystem
+    ) -> List[Tuple[Alert, bool]]:
+        """
+        Creates the alerts that don't already exist with the same `alert_id` from the same source,
+        e.g. when a network system retries posting alerts, instead of failing on them.
+        Returns `(alert, created)` for each dict, where the pk of an alert that was not created is the existing alert's pk.
+        """
+        if not json_dicts:
+            return []
+
+        alerts = self.get_model_objs_from_json(json_dicts, source)
+        existing_alert_keys = set(self._get_alert_pks(alerts))
+        new_alerts = []
+        alerts_and_created = []
+        for alert in alerts:
+            alert_key = (alert.alert_id, alert.source_id)
+            # Alerts posted more than once in the same request are also only created once
+            created = alert_key not in existing_alert_keys
+            if created:
+                existing_alert_keys.add(alert_key)
+                new_alerts.append(alert)
+            alerts_and_created.append((alert, created))
+
+        # Alerts created concurrently after the lookup above are skipped by the database (`ON CONFLICT DO NOTHING`)
+        with transaction.atomic():
+            Alert.objects.bulk_create(new_alerts, ignore_conflicts=True)
+
+        # The backend does not return the primary keys of rows inserted while ignoring conflicts
+        alert_pks = self._get_alert_pks(alerts)
+        for alert in alerts:
+            alert.pk = alert_pks[alert.alert_id, alert.source_id]
+        return alerts_and_created
+
+    def get_model_objs_from_json(self, json_dicts: List[dict], source: NetworkSystem):
+        """
+        Returns unsaved alerts mapped from the dicts; their related objects are created if they don't exist.
+        """
+        # Group the dicts by the field value getters that apply to them, so that each getter can resolve its values in bulk
+        json_dict_indices_per_field_mappings = {}
+        for i, json_dict in enumerate(json_dicts):
+            json_dict_indices_per_field_mappings.setdefault(
+                self.get_field_mappings(json_dict), []
+            ).append(i)
+        json_dict_indices_per_getter = {}
+        for (
+            field_mappings,
+            json_dict_indices,
+        ) in json_dict_indices_per_field_mappings.items():
+            for field_name, field_value_getter, _get_value in field_mappings:
+                json_dict_indices_per_getter.setdefault(
+                    (field_name, field_value_getter), []
+                ).extend(json_dict_indices)
+
+        alert_kwargs_list = [{} for _ in json_dicts]
+        for (
+            (field_name, field_value_getter),
+            json_dict_indices,
+        ) in json_dict_indices_per_getter.items():
+            values = field_value_getter.get_values_from_dicts(
+                [json_dicts[i] for i in json_dict_indices]
+            )
+            for i, value in zip(json_dict_indices, values):
+                alert_kwargs_list[i][field_name] = value
+
+        for alert_kwargs in alert_kwargs_list:
+            alert_kwargs["source"] = source
+
+        return [Alert(**alert_kwargs) for alert_kwargs in alert_kwargs_list]
+
+    @classmethod
+    def _set_pks(cls, alerts: List[Alert]):
+        # The database backend does not return the primary keys of bulk inserted rows
+        alert_pks = cls._get_alert_pks(alerts)
+        for alert in alerts:
+            alert.pk = alert_pks[alert.alert_id, alert.source_id]
+
+    @staticmethod
+    def _get_alert_pks(alerts: List[Alert]) -> dict:
+        """
+        Returns the pks of the saved alerts with the same `alert_id` and source as the passed alerts,
+        by `(alert_id, source_id)`.
+        """
+        alert_pks = {}
+        for alerts_chunk in chunks(alerts, LOOKUP_BATCH_SIZE):
+            alert_pks.update(
+                ((alert_id, source_id), pk)
+                for alert_id, source_id, pk in Alert.objects.filter(
+                    source__in={alert.source_id for alert in alerts_chunk},
+                    alert_id__in={alert.alert_id for alert in alerts_chunk},
+                ).values_list("alert_id", "source_id", "pk")
+            )
+        return alert_pks
+
+    @staticmethod
+    def _get_existing_alert_ids(alerts: List[Alert]):
+        existing_alert_ids = set()
+        for alerts_chunk in chunks(alerts, LOOKUP_BATCH_SIZE):
+            alert_keys = {(alert.alert_id, alert.source_id) for alert in alerts_chunk}
+            existing_alert_ids.update(
+                alert_id
+                for alert_id, source_id in Alert.objects.filter(
+                    alert_id__in=[alert_id for alert_id, _source_id in alert_keys]
+                ).values_list("alert_id", "source_id")
+                if (alert_id, source_id) in alert_keys
+            )
+        return existing_alert_ids
+
 
 NAV_FIELD_MAPPING = FieldMapping(
     NetworkSystem.NAV,
     {
         Alert.timestamp: PassthroughField("time"),
-        Alert.source: None,  # TODO: save source from posted alert
+        Alert.source: None,  # the network system that posted the alert
         Alert.alert_id: PassthroughField("history"),
         Alert.details_url: PassthroughField("alert_details_url"),
         Alert.problem_type: ForeignKeyField(
@@ -244,18 +701,110 @@ NAV_FIELD_MAPPING = FieldMapping(
     ),
 )
 
+# The keys are the names of the parameters of the webhook media type that posts the alerts from Zabbix,
+# which are set to the values of the macros in the comments
+ZABBIX_FIELD_MAPPING = FieldMapping(
+    NetworkSystem.ZABBIX,
+    {
+        Alert.timestamp: PassthroughField("time"),  # {EVENT.DATE}T{EVENT.TIME}
+        Alert.source: None,  # the network system that posted the alert
+        Alert.alert_id: PassthroughField("eventid"),  # {EVENT.ID}
+        Alert.details_url: PassthroughField("event_url"),
+        Alert.problem_type: ForeignKeyField(
+            ProblemType,
+            {
+                ProblemType.name: PassthroughField("trigger"),  # {TRIGGER.NAME}
+                ProblemType.description: PassthroughField(
+                    "trigger_description"  # {TRIGGER.DESCRIPTION}
+                ),
+            },
+        ),
+        Alert.description: PassthroughField("message"),  # {EVENT.NAME}
+        # None:               ('severity',  # {EVENT.SEVERITY}
+        #                      'tags'),  # {EVENT.TAGS}
+    },
+    Choose(
+        arg={
+            Alert.object: ForeignKeyField(
+                Object,
+                {
+                    Object.name: PassthroughField("host"),  # {HOST.NAME}
+                    Object.object_id: PassthroughField("hostid"),  # {HOST.ID}
+                    Object.url: PassthroughField("host_url"),
+                    Object.type: ForeignKeyField(
+                        ObjectType, {ObjectType.name: ConstantField("Host")}
+                    ),
+                },
+            ),
+            Alert.parent_object: None,
+        },
+        if_value_of="itemid",  # {ITEM.ID}
+        is_one_of=("", None),
+        else_arg={
+            Alert.object: ForeignKeyField(
+                Object,
+                {
+                    Object.name: PassthroughField("item"),  # {ITEM.NAME}
+                    Object.object_id: PassthroughField("itemid"),
+                    Object.url: PassthroughField("item_url"),
+                    Object.type: ForeignKeyField(
+                        ObjectType, {ObjectType.name: ConstantField("Item")}
+                    ),
+                },
+            ),
+            Alert.parent_object: ForeignKeyField(
+                ParentObject,
+                {
+                    ParentObject.name: PassthroughField("host"),
+                    ParentObject.parentobject_id: PassthroughField("hostid"),
+                    ParentObject.url: PassthroughField("host_url"),
+                },
+            ),
+        },
+    ),
+)
+
 SOURCE_MAPPING_DICT = {
     NetworkSystem.NAV: NAV_FIELD_MAPPING,
-    NetworkSystem.ZABBIX: None,
+    NetworkSystem.ZABBIX: ZABBIX_FIELD_MAPPING,
 }
 
 
-def create_alert_from_json(json_dict: dict, alert_source_type: str):
+def get_mapping_error_detail(error: Exception):
+    if isinstance(error, ValidationError):
+        return error.detail
+    elif isinstance(error, KeyError):
+        return f"The key {error} is missing."
+    return "The alert is not structured as expected."
+
+
+def get_field_mapping(alert_source_type: str) -> FieldMapping:
     try:
-        mapping = SOURCE_MAPPING_DICT[alert_source_type]
+        field_mapping = SOURCE_MAPPING_DICT[alert_source_type]
     except KeyError:
         raise serializers.ValidationError(
             f"Invalid network system type '{alert_source_type}'."
         )
+    if field_mapping is None:
+        raise serializers.ValidationError(
+            f"Alerts from network systems of type '{alert_source_type}' are not supported yet."
+        )
+    return field_mapping
+
+
+def create_alert_from_json(json_dict: dict, source: NetworkSystem):
+    return get_field_mapping(source.type).create_model_obj_from_json(json_dict, source)
+
+
+def create_alerts_from_json(json_dicts: List[dict], source: NetworkSystem):
+    return get_field_mapping(source.type).create_model_objs_from_json(
+        json_dicts, source
+    )
+
 
-    return mapping.create_model_obj_from_json(json_dict)
+def create_alerts_from_json_ignoring_duplicates(
+    json_dicts: List[dict], source: NetworkSystem
+):
+    return get_field_mapping(
+        source.type
+    ).create_model_objs_from_json_ignoring_duplicates(json_dicts, source)
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aas_alert', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['-timestamp', '-id'], name='alert_timestamp_id_idx'),
+        ),
+    ]
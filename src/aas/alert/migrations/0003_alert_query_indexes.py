@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aas_alert', '0002_alert_timestamp_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['source', '-timestamp'], name='alert_source_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['problem_type', '-timestamp'], name='alert_problem_timestamp_idx'),
+        ),
+    ]
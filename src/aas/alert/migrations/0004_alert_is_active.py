@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:35
+
+from django.db import migrations, models
+
+
+def set_is_active(apps, schema_editor):
+    Alert = apps.get_model('aas_alert', 'Alert')
+    Alert.objects.filter(active_state__isnull=False).update(is_active=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aas_alert', '0003_alert_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='is_active',
+            field=models.BooleanField(default=False, editable=False, help_text='Whether the alert has an `ActiveAlert`; kept in sync when it is created or deleted.'),
+        ),
+        migrations.RunPython(set_is_active, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(condition=models.Q(is_active=True), fields=['-timestamp', '-id'], name='alert_active_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('aas_alert', '0004_alert_is_active'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networksystem',
+            name='user',
+            field=models.OneToOneField(blank=True, help_text='The user that the network system authenticates as when posting alerts.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='network_system', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
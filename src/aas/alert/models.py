@@ -1,5 +1,11 @@
 from django.db import models
 from django.db.models import Q, QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from aas.auth.models import User
+
+from .utils import load_related
 
 
 class NetworkSystem(models.Model):
@@ -21,6 +27,14 @@ class NetworkSystem(models.Model):
     type = models.CharField(
         max_length=max(len(t[0]) for t in TYPE_CHOICES), choices=TYPE_CHOICES
     )
+    user = models.OneToOneField(
+        to=User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="network_system",
+        help_text="The user that the network system authenticates as when posting alerts.",
+    )
 
     def __str__(self):
         return f"{self.name} ({self.get_type_display()})"
@@ -53,7 +67,9 @@ class Object(models.Model):
     object_id = models.CharField(blank=True, max_length=20, verbose_name="object ID")
     url = models.URLField(verbose_name="URL")
     type = models.ForeignKey(
-        to=ObjectType, on_delete=models.CASCADE, related_name="instances",
+        to=ObjectType,
+        on_delete=models.CASCADE,
+        related_name="instances",
     )
     network_system = models.ForeignKey(
         to=NetworkSystem,
@@ -97,6 +113,24 @@ class Alert(models.Model):
                 fields=["alert_id", "source"], name="alert_unique_alert_id_per_source"
             ),
         ]
+        indexes = [
+            # Used when paginating alerts
+            models.Index(fields=["-timestamp", "-id"], name="alert_timestamp_id_idx"),
+            # Used when filtering alerts, e.g. by notification profiles
+            models.Index(
+                fields=["source", "-timestamp"], name="alert_source_timestamp_idx"
+            ),
+            models.Index(
+                fields=["problem_type", "-timestamp"],
+                name="alert_problem_timestamp_idx",
+            ),
+            # Used when listing the active alerts
+            models.Index(
+                fields=["-timestamp", "-id"],
+                name="alert_active_timestamp_idx",
+                condition=Q(is_active=True),
+            ),
+        ]
         ordering = ["-timestamp"]
 
     timestamp = models.DateTimeField()
@@ -134,6 +168,11 @@ class Alert(models.Model):
         verbose_name="ticket URL",
         help_text="URL to existing ticket in a ticketing system.",
     )
+    is_active = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Whether the alert has an `ActiveAlert`; kept in sync when it is created or deleted.",
+    )
 
     @property
     def alert_relations(self):
@@ -144,12 +183,16 @@ class Alert(models.Model):
 
     @staticmethod
     def get_active_alerts():
-        return Alert.objects.filter(active_state__isnull=False)
+        return Alert.objects.filter(is_active=True)
 
     @staticmethod
-    def prefetch_related_fields(qs: QuerySet):
-        return qs.prefetch_related(
-            "source", "object__type", "parent_object", "problem_type",
+    def load_related_fields(qs: QuerySet):
+        return load_related(
+            qs,
+            "source",
+            "object__type",
+            "parent_object",
+            "problem_type",
         )
 
 
@@ -163,6 +206,20 @@ class ActiveAlert(models.Model):
     )
 
 
+@receiver(post_save, sender=ActiveAlert)
+def _set_alert_active(sender, instance: ActiveAlert, **kwargs):
+    Alert.objects.filter(pk=instance.alert_id).update(is_active=True)
+    if ActiveAlert.alert.is_cached(instance):
+        instance.alert.is_active = True
+
+
+@receiver(post_delete, sender=ActiveAlert)
+def _set_alert_inactive(sender, instance: ActiveAlert, **kwargs):
+    Alert.objects.filter(pk=instance.alert_id).update(is_active=False)
+    if ActiveAlert.alert.is_cached(instance):
+        instance.alert.is_active = False
+
+
 class AlertRelationType(models.Model):
     class Meta:
         ordering = ["name"]
@@ -185,7 +242,9 @@ class AlertRelation(models.Model):
         related_name="+",  # don't create a backwards relation
     )
     type = models.ForeignKey(
-        to=AlertRelationType, on_delete=models.CASCADE, related_name="alert_relations",
+        to=AlertRelationType,
+        on_delete=models.CASCADE,
+        related_name="alert_relations",
     )
     description = models.TextField(blank=True)
 
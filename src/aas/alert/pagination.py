@@ -0,0 +1,123 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class AlertCursorPagination(BasePagination):
+    """
+    Keyset pagination on `(timestamp, pk)`, newest alerts first,
+    so that fetching a page costs the same regardless of how deep it is.
+    Only paginates when the `cursor` or `page_size` query parameter is passed,
+    to keep returning all the alerts to clients that don't.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None):
+        if (
+            self.cursor_query_param not in request.query_params
+            and self.page_size_query_param not in request.query_params
+        ):
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor[0]
+        if reverse:
+            queryset = queryset.order_by("timestamp", "pk")
+        else:
+            queryset = queryset.order_by("-timestamp", "-pk")
+
+        if self.cursor is not None:
+            _reverse, timestamp, pk = self.cursor
+            # The first condition lets the database seek directly to the cursor's position in the index
+            if reverse:
+                queryset = queryset.filter(
+                    Q(timestamp__gte=timestamp)
+                    & (Q(timestamp__gt=timestamp) | Q(pk__gt=pk))
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(timestamp__lte=timestamp)
+                    & (Q(timestamp__lt=timestamp) | Q(pk__lt=pk))
+                )
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.results = results
+        return results
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, "ALERT_PAGE_SIZE", 100)
+        max_page_size = getattr(settings, "ALERT_MAX_PAGE_SIZE", 1000)
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return page_size
+        return min(max(page_size, 1), max_page_size)
+
+    def decode_cursor(self, request):
+        encoded_cursor = request.query_params.get(self.cursor_query_param)
+        if not encoded_cursor:
+            return None
+
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded_cursor.encode("ascii")))
+            timestamp = parse_datetime(cursor["t"])
+            pk = int(cursor["p"])
+            reverse = bool(cursor["r"])
+        except (BinasciiError, UnicodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if timestamp is None:
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, timestamp, pk
+
+    def encode_cursor(self, reverse: bool, item):
+        cursor = {"t": item.timestamp.isoformat(), "p": item.pk, "r": reverse}
+        encoded_cursor = urlsafe_b64encode(json.dumps(cursor).encode()).decode("ascii")
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded_cursor
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.results:
+            return None
+        return self.encode_cursor(False, self.results[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.results:
+            return None
+        return self.encode_cursor(True, self.results[0])
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
@@ -1,29 +1,169 @@
+import codecs
+import gzip
+import json
 import re
+import zlib
 from json import JSONDecodeError, JSONDecoder
 
-from rest_framework.exceptions import ParseError
+from django.conf import settings
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
 from rest_framework.parsers import BaseParser
 
 NOT_WHITESPACE = re.compile(r"[^\s]")
+# The part of a number, literal (e.g. `true`) or `\uXXXX` escape that might continue in the next block
+INCOMPLETE_TOKEN = re.compile(r"[-+.\w]*")
+
+BLOCK_SIZE = 64 * 1024
+
+
+def read_body_blocks(stream, parser_context=None, block_size=BLOCK_SIZE):
+    """
+    Reads the request body in blocks of bytes, decompressing it according to the request's `Content-Encoding`.
+    Raises `ParseError` if the (decompressed) body is larger than `ALERT_PARSER_MAX_BODY_SIZE`.
+    """
+    if stream is None:
+        return
+
+    request = (parser_context or {}).get("request")
+    content_encoding = (
+        request.META.get("HTTP_CONTENT_ENCODING", "") if request is not None else ""
+    )
+    content_encoding = content_encoding.strip().lower()
+    if content_encoding == "gzip":
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    elif content_encoding not in {"", "identity"}:
+        raise UnsupportedMediaType(
+            content_encoding,
+            detail=f'Unsupported content encoding "{content_encoding}" in request.',
+        )
+
+    max_body_size = getattr(settings, "ALERT_PARSER_MAX_BODY_SIZE", 100 * 1024 ** 2)
+    body_size = 0
+    while True:
+        try:
+            data = stream.read(block_size)
+        except (OSError, EOFError, zlib.error):
+            raise ParseError("Could not decompress the request body.")
+        if not data:
+            return
+
+        body_size += len(data)
+        if body_size > max_body_size:
+            raise ParseError("The request body is too large.")
+        yield data
 
 
 class StackedJSONParser(BaseParser):
+    """
+    Parses JSON objects posted one after another, while reading the request body in blocks,
+    so that each object can be processed as soon as it has been received,
+    and without holding more than about one object in memory at a time.
+    """
+
     media_type = "text/plain"
 
     decoder = JSONDecoder()
+    block_size = BLOCK_SIZE
 
     def parse(self, stream, media_type=None, parser_context=None):
-        # Code from https://stackoverflow.com/a/50384432/
-        document = stream.read().decode(encoding="utf-8", errors="ignore")
+        max_object_size = getattr(settings, "ALERT_PARSER_MAX_OBJECT_SIZE", 1024 ** 2)
+        blocks = self.read_text_blocks(stream, parser_context)
+        document = ""
         pos = 0
+        at_end = False
         while True:
             match = NOT_WHITESPACE.search(document, pos)
-            if not match:
+            if match:
+                pos = match.start()
+                try:
+                    obj, end = self.decoder.raw_decode(document, pos)
+                except JSONDecodeError as e:
+                    if not at_end and not self.is_incomplete(document, e):
+                        # More data would not make the object valid
+                        raise ParseError("Could not parse posted JSON objects.")
+                    end = None
+
+                # A value that is only followed by the start of a token might continue in the next block
+                # (e.g. the digits or exponent of a number), unless it's an object, array or string
+                if end is not None and (
+                    at_end
+                    or document[pos] in '{["'
+                    or not INCOMPLETE_TOKEN.fullmatch(document, end)
+                ):
+                    if end - pos > max_object_size:
+                        raise ParseError("A posted JSON object is too large.")
+                    pos = end
+                    yield obj
+                    continue
+
+                if at_end:
+                    raise ParseError("Could not parse posted JSON objects.")
+                if len(document) - pos > max_object_size:
+                    raise ParseError("A posted JSON object is too large.")
+            elif at_end:
                 return
-            pos = match.start()
+            else:
+                pos = len(document)
+
+            # Drop the parsed part of the buffer, and read more of the object that is not complete yet
+            document = document[pos:]
+            pos = 0
+            block = next(blocks, None)
+            if block is None:
+                at_end = True
+            else:
+                document += block
+
+    @staticmethod
+    def is_incomplete(document: str, error: JSONDecodeError):
+        """
+        Returns whether the error might be caused by the document ending in the middle of an object,
+        rather than by a syntax error before the end of the document.
+        """
+        if error.msg.startswith("Unterminated string"):
+            return True
+        return INCOMPLETE_TOKEN.fullmatch(document, error.pos) is not None
+
+    def read_text_blocks(self, stream, parser_context=None):
+        text_decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        for data in read_body_blocks(stream, parser_context, self.block_size):
+            yield text_decoder.decode(data)
+        yield text_decoder.decode(b"", final=True)
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON (one JSON object per line), while reading the request body in blocks,
+    so that each object can be processed as soon as its line has been received.
+    """
+
+    media_type = "application/x-ndjson"
+
+    block_size = BLOCK_SIZE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        max_object_size = getattr(settings, "ALERT_PARSER_MAX_OBJECT_SIZE", 1024 ** 2)
+        line_number = 0
+        incomplete_line = b""
+        for data in read_body_blocks(stream, parser_context, self.block_size):
+            lines = (incomplete_line + data).split(b"\n")
+            incomplete_line = lines.pop()
+            if len(incomplete_line) > max_object_size:
+                raise ParseError("A posted JSON object is too large.")
+
+            for line in lines:
+                line_number += 1
+                if line.strip():
+                    yield self.parse_line(line, line_number, max_object_size)
+
+        if incomplete_line.strip():
+            yield self.parse_line(incomplete_line, line_number + 1, max_object_size)
 
-            try:
-                obj, pos = self.decoder.raw_decode(document, pos)
-            except JSONDecodeError:
-                raise ParseError("Could not parse posted JSON objects.")
-            yield obj
+    @staticmethod
+    def parse_line(line: bytes, line_number: int, max_object_size: int):
+        if len(line) > max_object_size:
+            raise ParseError("A posted JSON object is too large.")
+        try:
+            return json.loads(line.decode("utf-8"))
+        except ValueError:
+            raise ParseError(f"Could not parse the posted JSON on line {line_number}.")
@@ -1,3 +1,8 @@
+from typing import Iterable, Tuple, Union
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.db.models.constants import LOOKUP_SEP
 from rest_framework import serializers
 
 from .models import Alert, NetworkSystem, Object, ObjectType, ParentObject, ProblemType
@@ -78,8 +83,191 @@ class AlertSerializer(RemovableFieldSerializer):
     object = ObjectSerializer(read_only=True)
     parent_object = ParentObjectSerializer(read_only=True)
     problem_type = ProblemTypeSerializer(read_only=True)
+    active_state = serializers.BooleanField(source="is_active", read_only=True)
+
+
+class FastAlertSerializer:
+    """
+    Produces the same output as `AlertSerializer`, but from the rows of a `.values_list()` or `.values()` query
+    of `ROW_FIELDS` instead of model instances, and without running DRF's field machinery for each alert.
+    The dicts of the source, object, etc. are only built once per serializer instance,
+    and shared between the alerts that refer to the same row.
+    """
+
+    ROW_FIELDS = (
+        "pk",
+        "timestamp",
+        "source_id",
+        "source__name",
+        "source__type",
+        "alert_id",
+        "object_id",
+        "object__name",
+        "object__object_id",
+        "object__url",
+        "object__type_id",
+        "object__type__name",
+        "parent_object_id",
+        "parent_object__name",
+        "parent_object__parentobject_id",
+        "parent_object__url",
+        "details_url",
+        "problem_type_id",
+        "problem_type__name",
+        "problem_type__description",
+        "description",
+        "ticket_url",
+        "is_active",
+    )
+
+    SOURCE_TYPE_DISPLAY = dict(NetworkSystem.TYPE_CHOICES)
+    # The attribute names to follow from an alert instance to each of the `ROW_FIELDS`
+    ROW_ATTNAME_PATHS = tuple(
+        tuple(field_name.split(LOOKUP_SEP)) for field_name in ROW_FIELDS
+    )
+
+    def __init__(self, rows: Union[QuerySet, Iterable[Tuple]] = (), context=None):
+        if isinstance(rows, QuerySet):
+            rows = self.get_rows(rows)
+        self.rows = rows
+        self.context = context or {}
+        self.include_pks = RemovableFieldSerializer.NO_PKS_KEY not in self.context
+
+        self._timestamp_field = serializers.DateTimeField()
+        self._sources = {}
+        self._objects = {}
+        self._object_types = {}
+        self._parent_objects = {}
+        self._problem_types = {}
+
+    @classmethod
+    def get_rows(cls, queryset: QuerySet):
+        # Prefetching does not work with `.values_list()`, and is not needed, as the related fields are joined
+        return queryset.prefetch_related(None).values_list(*cls.ROW_FIELDS)
+
+    @classmethod
+    def get_row_of_alert(cls, alert: Alert):
+        """
+        Returns the row of an alert instance, with its related objects loaded, to be passed to `to_representation()`.
+        """
+        row = []
+        for attname_path in cls.ROW_ATTNAME_PATHS:
+            value = alert
+            for attname in attname_path:
+                value = getattr(value, attname)
+                # E.g. the fields of a missing parent object
+                if value is None:
+                    break
+            row.append(value)
+        return tuple(row)
+
+    @property
+    def data(self):
+        return [self.to_representation(row) for row in self.rows]
+
+    def to_representation(self, row: Union[Tuple, dict]):
+        if isinstance(row, dict):
+            row = tuple(row[field_name] for field_name in self.ROW_FIELDS)
+        (
+            pk,
+            timestamp,
+            source_pk,
+            source_name,
+            source_type,
+            alert_id,
+            object_pk,
+            object_name,
+            object_object_id,
+            object_url,
+            object_type_pk,
+            object_type_name,
+            parent_object_pk,
+            parent_object_name,
+            parent_object_parentobject_id,
+            parent_object_url,
+            details_url,
+            problem_type_pk,
+            problem_type_name,
+            problem_type_description,
+            description,
+            ticket_url,
+            is_active,
+        ) = row
+
+        source_repr = self._sources.get(source_pk)
+        if source_repr is None:
+            source_repr = self._sources[source_pk] = self._with_pk(
+                source_pk,
+                {
+                    "name": source_name,
+                    "type": self.SOURCE_TYPE_DISPLAY.get(source_type, source_type),
+                },
+            )
+
+        object_repr = self._objects.get(object_pk)
+        if object_repr is None:
+            object_type_repr = self._object_types.get(object_type_pk)
+            if object_type_repr is None:
+                object_type_repr = self._object_types[object_type_pk] = self._with_pk(
+                    object_type_pk, {"name": object_type_name}
+                )
+            object_repr = self._objects[object_pk] = self._with_pk(
+                object_pk,
+                {
+                    "name": object_name,
+                    "object_id": object_object_id,
+                    "url": object_url,
+                    "type": object_type_repr,
+                },
+            )
+
+        if parent_object_pk is None:
+            parent_object_repr = None
+        else:
+            parent_object_repr = self._parent_objects.get(parent_object_pk)
+            if parent_object_repr is None:
+                parent_object_repr = self._parent_objects[parent_object_pk] = (
+                    self._with_pk(
+                        parent_object_pk,
+                        {
+                            "name": parent_object_name,
+                            "parentobject_id": parent_object_parentobject_id,
+                            "url": parent_object_url,
+                        },
+                    )
+                )
+
+        problem_type_repr = self._problem_types.get(problem_type_pk)
+        if problem_type_repr is None:
+            problem_type_repr = self._problem_types[problem_type_pk] = self._with_pk(
+                problem_type_pk,
+                {"name": problem_type_name, "description": problem_type_description},
+            )
+
+        return self._with_pk(
+            pk,
+            {
+                "timestamp": self._timestamp_field.to_representation(timestamp),
+                "source": source_repr,
+                "alert_id": alert_id,
+                "object": object_repr,
+                "parent_object": parent_object_repr,
+                "details_url": details_url,
+                "problem_type": problem_type_repr,
+                "description": description,
+                "ticket_url": ticket_url,
+                "active_state": is_active,
+            },
+        )
+
+    def _with_pk(self, pk, obj_repr: dict):
+        if not self.include_pks:
+            return obj_repr
+        return {"pk": pk, **obj_repr}
+
 
-    def to_representation(self, instance: Alert):
-        alert_repr = super().to_representation(instance)
-        alert_repr["active_state"] = hasattr(instance, "active_state")
-        return alert_repr
+def serialize_alerts(queryset: QuerySet, context=None):
+    context = context or {}
+    if getattr(settings, "ALERT_FAST_SERIALIZATION", True):
+        return FastAlertSerializer(queryset, context=context).data
+    return AlertSerializer(queryset, many=True, context=context).data
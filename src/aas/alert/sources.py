@@ -0,0 +1,102 @@
+import time
+from threading import Lock
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from rest_framework.exceptions import PermissionDenied
+
+from aas.auth.models import User
+from .models import NetworkSystem
+
+# Incremented whenever network systems change, so that other processes can detect it
+TABLE_VERSION_CACHE_KEY = "alert:network_system_table_version"
+
+
+class NetworkSystemTable:
+    """
+    An in-memory table of the network systems, for finding the source of posted alerts without querying the database.
+    It is reloaded after network systems have been changed in this process,
+    or in other processes (detected through the cache), and otherwise periodically.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._loaded_at = None
+        self._version = None
+        self._network_systems_per_user_pk = {}
+        self._network_systems_per_type = {}
+
+    def get_by_user_pk(self, user_pk: int) -> Optional[NetworkSystem]:
+        with self._lock:
+            self._refresh()
+            return self._network_systems_per_user_pk.get(user_pk)
+
+    def get_by_type(self, network_system_type: str) -> List[NetworkSystem]:
+        with self._lock:
+            self._refresh()
+            return list(self._network_systems_per_type.get(network_system_type, ()))
+
+    def mark_changed(self):
+        with self._lock:
+            self._loaded_at = None
+            try:
+                cache.incr(TABLE_VERSION_CACHE_KEY)
+            except ValueError:
+                cache.set(TABLE_VERSION_CACHE_KEY, 1, timeout=None)
+
+    def _refresh(self):
+        max_age = getattr(settings, "NETWORK_SYSTEM_TABLE_MAX_AGE", 60)
+        if (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at <= max_age
+            and cache.get(TABLE_VERSION_CACHE_KEY) == self._version
+        ):
+            return
+
+        self._version = cache.get(TABLE_VERSION_CACHE_KEY)
+        self._network_systems_per_user_pk = {}
+        self._network_systems_per_type = {}
+        for network_system in NetworkSystem.objects.all():
+            if network_system.user_id is not None:
+                self._network_systems_per_user_pk[network_system.user_id] = (
+                    network_system
+                )
+            self._network_systems_per_type.setdefault(network_system.type, []).append(
+                network_system
+            )
+        self._loaded_at = time.monotonic()
+
+
+network_system_table = NetworkSystemTable()
+
+
+def get_source_of_request(request) -> NetworkSystem:
+    source = network_system_table.get_by_user_pk(request.user.pk)
+    if source is not None:
+        return source
+
+    # A network system that hasn't been given a user yet can still post alerts, as long as it's unambiguous
+    nav_systems = network_system_table.get_by_type(NetworkSystem.NAV)
+    if len(nav_systems) == 1 and nav_systems[0].user_id is None:
+        return nav_systems[0]
+    raise PermissionDenied(
+        f"The user '{request.user}' is not the user of any network system."
+    )
+
+
+@receiver([post_save, post_delete], sender=NetworkSystem)
+@receiver(post_delete, sender=User)
+def _update_table_on_change(sender, **kwargs):
+    network_system_table.mark_changed()
+    # Other threads might have reloaded the table before the change was committed
+    transaction.on_commit(network_system_table.mark_changed)
+
+
+@receiver(post_migrate)
+def _invalidate_table(sender, **kwargs):
+    # The database might have been flushed, which does not send any delete signals
+    network_system_table.mark_changed()
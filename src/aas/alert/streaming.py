@@ -0,0 +1,72 @@
+from typing import Iterable
+
+from django.conf import settings
+from django.db.models import QuerySet, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import AlertSerializer, FastAlertSerializer
+
+STREAM_QUERY_PARAM = "stream"
+
+
+def streaming_requested(request):
+    value = request.query_params.get(STREAM_QUERY_PARAM)
+    return value is not None and value.lower() in {"", "1", "true"}
+
+
+def iterate_in_chunks(queryset: QuerySet, chunk_size: int):
+    # `QuerySet.iterator()` ignores `prefetch_related()`, so the lookups are instead prefetched for one chunk at a time
+    prefetch_lookups = queryset._prefetch_related_lookups
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            prefetch_related_objects(chunk, *prefetch_lookups)
+            yield chunk
+            chunk = []
+    if chunk:
+        prefetch_related_objects(chunk, *prefetch_lookups)
+        yield chunk
+
+
+def iterate_serialized_alerts_in_chunks(queryset: QuerySet, chunk_size: int):
+    if getattr(settings, "ALERT_FAST_SERIALIZATION", True):
+        serializer = FastAlertSerializer()
+        chunk = []
+        for row in serializer.get_rows(queryset).iterator(chunk_size=chunk_size):
+            chunk.append(serializer.to_representation(row))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    else:
+        for chunk in iterate_in_chunks(queryset, chunk_size):
+            yield AlertSerializer(chunk, many=True).data
+
+
+def stream_json_array(data_chunks: Iterable[list]):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    yield "["
+    first = True
+    for data_chunk in data_chunks:
+        elements = ",".join(encoder.encode(data) for data in data_chunk)
+        if first:
+            first = False
+            yield elements
+        else:
+            yield "," + elements
+    yield "]"
+
+
+def stream_alerts_response(queryset: QuerySet):
+    """
+    Returns a response that serializes and sends the alerts in chunks while iterating over them,
+    so that the whole list of alerts is never held in memory.
+    """
+    chunk_size = getattr(settings, "ALERT_STREAMING_CHUNK_SIZE", 500)
+    return StreamingHttpResponse(
+        stream_json_array(iterate_serialized_alerts_in_chunks(queryset, chunk_size)),
+        content_type="application/json",
+    )
@@ -1,3 +1,700 @@
-from django.test import TestCase
+import gzip
+import json
+from datetime import datetime, timedelta
+from io import BytesIO
+from unittest.mock import Mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ParseError, UnsupportedMediaType, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITransactionTestCase
+
+from aas.auth.models import User
+from . import mappings
+from .parsers import NDJSONParser, StackedJSONParser
+from .serializers import AlertSerializer, FastAlertSerializer
+from .models import (
+    ActiveAlert,
+    Alert,
+    NetworkSystem,
+    Object,
+    ObjectType,
+    ParentObject,
+    ProblemType,
+)
+
+
+def nav_alert_json(history: int, netbox: int, subid="", alert_type="boxDown"):
+    return {
+        "id": history + 1000,
+        "history": history,
+        "time": "2019-11-05T10:03:10.235877",
+        "message": f"box down example-sw{netbox}.example.org",
+        "source": "pping",
+        "state": "s",
+        "on_maintenance": False,
+        "netbox": netbox,
+        "device_groups": None,
+        "device": None,
+        "subid": subid,
+        "subject_type": "Interface" if subid else "Netbox",
+        "subject": f"example-sw{netbox}.example.org",
+        "subject_url": f"/api/v1/ipdevinfo/example-sw{netbox}.example.org/",
+        "alert_details_url": f"/api/v1/alerts/{history}/",
+        "netbox_history_url": f"/api/v1/devicehistory/history/%3Fnetbox={netbox}",
+        "event_history_url": "/api/v1/devicehistory/history/?eventtype=e_boxState",
+        "event_type": {
+            "description": "Tells us whether a network-unit is down or up.",
+            "id": "boxState",
+        },
+        "alert_type": {"description": "Box declared down.", "name": alert_type},
+        "severity": 50,
+        "value": 100,
+    }
+
+
+def zabbix_alert_json(eventid: int, hostid: int, itemid="", trigger="Host is down"):
+    return {
+        "eventid": eventid,
+        "time": "2020-02-03T12:34:56",
+        "message": f"{trigger} on host{hostid}.example.org",
+        "event_url": f"https://zabbix.example.org/tr_events.php?eventid={eventid}",
+        "trigger": trigger,
+        "trigger_description": "The host has not responded to ICMP ping.",
+        "severity": "High",
+        "hostid": hostid,
+        "host": f"host{hostid}.example.org",
+        "host_url": f"https://zabbix.example.org/hosts.php?hostid={hostid}",
+        "itemid": itemid,
+        "item": f"Item {itemid}" if itemid else "",
+        "item_url": (
+            f"https://zabbix.example.org/items.php?itemid={itemid}" if itemid else ""
+        ),
+    }
+
+
+class TestMappings(TransactionTestCase):
+    def setUp(self):
+        self.nav1 = NetworkSystem.objects.create(
+            name="Gløshaugen", type=NetworkSystem.NAV
+        )
+        self.zabbix1 = NetworkSystem.objects.create(
+            name="Gløshaugen", type=NetworkSystem.ZABBIX
+        )
+
+    def test_create_alerts_from_json(self):
+        json_dicts = [
+            nav_alert_json(1, 10),
+            nav_alert_json(2, 10, subid="5"),
+            nav_alert_json(3, 11, alert_type="boxUp"),
+            nav_alert_json(4, 10),
+        ]
+        alerts = mappings.create_alerts_from_json(json_dicts, self.nav1)
+
+        self.assertEqual([alert.alert_id for alert in alerts], ["1", "2", "3", "4"])
+        self.assertTrue(all(alert.pk for alert in alerts))
+        self.assertEqual(Alert.objects.count(), 4)
+        # Equal dimension rows should only be created once
+        self.assertEqual(ProblemType.objects.count(), 2)
+        self.assertEqual(ObjectType.objects.count(), 2)
+        self.assertEqual(Object.objects.count(), 3)
+        self.assertEqual(ParentObject.objects.count(), 1)
+        self.assertEqual(alerts[0].object, alerts[3].object)
+        self.assertEqual(alerts[1].parent_object.parentobject_id, "10")
+        self.assertIsNone(alerts[0].parent_object)
+
+        # The created alerts should be equal to fetched alerts, without having to be re-fetched
+        fetched_alerts = Alert.load_related_fields(Alert.objects.order_by("alert_id"))
+        self.assertEqual(
+            AlertSerializer(fetched_alerts, many=True).data,
+            AlertSerializer(alerts, many=True).data,
+        )
+        self.assertEqual(alerts[0].timestamp, fetched_alerts[0].timestamp)
+        self.assertEqual(alerts[0].description, "box down example-sw10.example.org")
+
+        # Existing dimension rows should be reused, and be loaded with their related objects
+        mappings.ForeignKeyField.clear_caches()
+        alert = mappings.create_alerts_from_json(
+            [nav_alert_json(5, 11, alert_type="boxUp")], self.nav1
+        )[0]
+        with self.assertNumQueries(0):
+            AlertSerializer(alert).data
+        self.assertEqual(alert.object, alerts[2].object)
+        self.assertEqual(alert.problem_type, alerts[2].problem_type)
+        self.assertEqual(Object.objects.count(), 3)
+
+    def test_create_alerts_from_json_number_of_queries(self):
+        def count_queries(json_dicts):
+            with CaptureQueriesContext(connection) as context:
+                mappings.create_alerts_from_json(json_dicts, self.nav1)
+            return len(context.captured_queries)
+
+        # Create the problem type and object type shared by the alerts below
+        count_queries([nav_alert_json(1, 1)])
+
+        few_alerts_queries = count_queries([nav_alert_json(i, i) for i in range(2, 4)])
+        many_alerts_queries = count_queries(
+            [nav_alert_json(i, i) for i in range(100, 150)]
+        )
+        self.assertEqual(few_alerts_queries, many_alerts_queries)
+
+    def test_passthrough_field_values_are_coerced(self):
+        alert_json = nav_alert_json(1, 10)
+        alert_json["message"] = None
+        alert_json["alert_details_url"] = " /api/v1/alerts/1/\n"
+        alert = mappings.create_alert_from_json(alert_json, self.nav1)
+        self.assertEqual(alert.alert_id, "1")
+        self.assertEqual(alert.description, "")
+        self.assertEqual(alert.details_url, "/api/v1/alerts/1/")
+        self.assertEqual(
+            alert.timestamp,
+            timezone.make_aware(
+                datetime(2019, 11, 5, 10, 3, 10, 235877),
+                timezone.get_default_timezone(),
+            ),
+        )
+        self.assertEqual(alert.timestamp, Alert.objects.get(pk=alert.pk).timestamp)
+
+        alert_json = nav_alert_json(2, 10)
+        alert_json["time"] = "not a timestamp"
+        with self.assertRaises(ValidationError):
+            mappings.create_alert_from_json(alert_json, self.nav1)
+
+    def test_create_alerts_from_zabbix_json(self):
+        json_dicts = [
+            zabbix_alert_json(1, 10),
+            zabbix_alert_json(2, 10, itemid=20, trigger="Interface is down"),
+            zabbix_alert_json(3, 11),
+        ]
+        alerts = mappings.create_alerts_from_json(json_dicts, self.zabbix1)
+
+        self.assertEqual([alert.alert_id for alert in alerts], ["1", "2", "3"])
+        self.assertTrue(all(alert.source == self.zabbix1 for alert in alerts))
+        self.assertEqual(alerts[0].object.name, "host10.example.org")
+        self.assertEqual(alerts[0].object.object_id, "10")
+        self.assertEqual(alerts[0].object.type.name, "Host")
+        self.assertIsNone(alerts[0].parent_object)
+        self.assertEqual(alerts[1].object.object_id, "20")
+        self.assertEqual(alerts[1].object.type.name, "Item")
+        self.assertEqual(alerts[1].parent_object.parentobject_id, "10")
+        self.assertEqual(alerts[1].problem_type.name, "Interface is down")
+        self.assertEqual(ProblemType.objects.count(), 2)
+        self.assertEqual(ObjectType.objects.count(), 2)
+
+        # Single alerts should be mapped equally to alerts mapped in bulk
+        alert = mappings.create_alert_from_json(
+            zabbix_alert_json(4, 10, itemid=20, trigger="Interface is down"),
+            self.zabbix1,
+        )
+        self.assertEqual(alert.object, alerts[1].object)
+        self.assertEqual(alert.parent_object, alerts[1].parent_object)
+        self.assertEqual(alert.problem_type, alerts[1].problem_type)
+        self.assertEqual(alert.timestamp, alerts[1].timestamp)
+
+    def test_compiled_field_mappings_are_chosen_per_dict(self):
+        field_mapping = mappings.NAV_FIELD_MAPPING
+        netbox_field_mappings = field_mapping.get_field_mappings(nav_alert_json(1, 10))
+        interface_field_mappings = field_mapping.get_field_mappings(
+            nav_alert_json(2, 10, subid="5")
+        )
+        # The merged field mappings should be reused, instead of being merged for each dict
+        self.assertIs(
+            field_mapping.get_field_mappings(nav_alert_json(3, 11)),
+            netbox_field_mappings,
+        )
+        self.assertNotIn(
+            "parent_object",
+            [field_name for field_name, _getter, _get_value in netbox_field_mappings],
+        )
+        get_value_per_field_name = {
+            field_name: get_value
+            for field_name, _getter, get_value in interface_field_mappings
+        }
+        self.assertEqual(
+            get_value_per_field_name["description"](nav_alert_json(2, 10, subid="5")),
+            "box down example-sw10.example.org",
+        )
+        self.assertIn("parent_object", get_value_per_field_name)
+
+    def test_foreign_key_cache(self):
+        mappings.create_alert_from_json(nav_alert_json(1, 10), self.nav1)
+        problem_type_cache = mappings.ForeignKeyField.get_cache(ProblemType)
+        misses = problem_type_cache.misses
+
+        with CaptureQueriesContext(connection) as context:
+            alert = mappings.create_alert_from_json(nav_alert_json(2, 10), self.nav1)
+        # Only the alert itself should have been queried
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(problem_type_cache.misses, misses)
+        self.assertGreater(problem_type_cache.hits, 0)
+
+        # Deleted objects should not be returned from the cache
+        alert.problem_type.delete()
+        alert = mappings.create_alert_from_json(nav_alert_json(3, 10), self.nav1)
+        self.assertTrue(ProblemType.objects.filter(pk=alert.problem_type.pk).exists())
+
+    def test_foreign_key_cache_is_invalidated_by_primary_key(self):
+        mappings.create_alert_from_json(nav_alert_json(1, 10), self.nav1)
+        problem_type_cache = mappings.ForeignKeyField.get_cache(ProblemType)
+        problem_type = ProblemType.objects.get()
+        self.assertEqual(len(problem_type_cache._keys_by_index_key[problem_type.pk]), 1)
+
+        problem_type.save()
+        self.assertNotIn(problem_type.pk, problem_type_cache._keys_by_index_key)
+        self.assertEqual(problem_type_cache.stats["size"], 0)
+
+
+class TestStackedJSONParser(SimpleTestCase):
+    def parse(self, body: bytes, block_size=4):
+        parser = StackedJSONParser()
+        parser.block_size = block_size
+        return list(parser.parse(BytesIO(body)))
+
+    def test_stacked_json_parser(self):
+        objs = [{"a": "æøå", "b": [1, 2.5, None]}, 12345, "abc", [], {}, True]
+        body = "\n".join(json.dumps(obj, ensure_ascii=False) for obj in objs)
+        body = f" {body}\n\n".encode()
+        # Every block size splits the values (and the multi-byte characters) in different places
+        for block_size in range(1, len(body) + 1):
+            self.assertEqual(self.parse(body, block_size), objs)
+        self.assertEqual(
+            self.parse(b'{"a": 1}{"a": 2}  12 3'), [{"a": 1}, {"a": 2}, 12, 3]
+        )
+
+        self.assertEqual(self.parse(b""), [])
+        self.assertEqual(self.parse(b" \n "), [])
+        self.assertEqual(list(StackedJSONParser().parse(None)), [])
+
+        for invalid_body in (b'{"a": 1', b'{"a": 1} {"b"}', b"[1, 2]]"):
+            with self.assertRaises(ParseError):
+                self.parse(invalid_body)
+
+    def test_stacked_json_parser_reports_syntax_errors_immediately(self):
+        parser = StackedJSONParser()
+        parser.block_size = 16
+        body = BytesIO(b'{"a": 1}\n{"a" 2}\n' + b'{"a": 1}\n' * 10000)
+        objs = parser.parse(body)
+        self.assertEqual(next(objs), {"a": 1})
+        with self.assertRaisesMessage(ParseError, "Could not parse"):
+            next(objs)
+        # The rest of the body should not have been read
+        self.assertLess(body.tell(), 100)
+
+        # Objects split in the middle of a string, number or literal should still be parsed
+        for block_size in range(1, 12):
+            self.assertEqual(
+                self.parse(b'"ab\\u00e6" -1.5e-3 true null', block_size),
+                ["ab\u00e6", -1.5e-3, True, None],
+            )
+
+    @override_settings(ALERT_PARSER_MAX_OBJECT_SIZE=10, ALERT_PARSER_MAX_BODY_SIZE=30)
+    def test_stacked_json_parser_size_limits(self):
+        self.assertEqual(self.parse(b'{"a": 1}\n' * 3), [{"a": 1}] * 3)
+        with self.assertRaises(ParseError):
+            self.parse(b'{"a": "12345"}')
+        with self.assertRaises(ParseError):
+            self.parse(b'{"a": "12345')
+        with self.assertRaises(ParseError):
+            self.parse(b'{"a": 1}\n' * 4)
+
+
+class ReadOnlyStream:
+    # Like the request stream, it can't be seeked
+    def __init__(self, data: bytes):
+        self.stream = BytesIO(data)
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+
+class TestNDJSONParser(SimpleTestCase):
+    def parse(self, body: bytes, block_size=4, content_encoding=""):
+        parser = NDJSONParser()
+        parser.block_size = block_size
+        request = Mock(META={"HTTP_CONTENT_ENCODING": content_encoding})
+        return list(
+            parser.parse(ReadOnlyStream(body), parser_context={"request": request})
+        )
+
+    def test_ndjson_parser(self):
+        objs = [{"a": "æøå", "b": [1, 2.5, None]}, 12345, "abc", [], {}, True]
+        body = "\n".join(json.dumps(obj, ensure_ascii=False) for obj in objs)
+        for block_size in range(1, len(body) + 1):
+            self.assertEqual(self.parse(body.encode(), block_size), objs)
+        self.assertEqual(self.parse(f"\n{body}\r\n\n".encode()), objs)
+        self.assertEqual(self.parse(b""), [])
+
+        with self.assertRaisesMessage(ParseError, "line 2"):
+            self.parse(b'{"a": 1}\n{"a": 1}{"a": 2}\n')
+        with self.assertRaises(ParseError):
+            self.parse(b'{"a": \n1}')
+
+    def test_ndjson_parser_with_gzip(self):
+        objs = [{"a": i} for i in range(100)]
+        body = "\n".join(json.dumps(obj) for obj in objs).encode()
+        self.assertEqual(
+            self.parse(gzip.compress(body), block_size=16, content_encoding="gzip"),
+            objs,
+        )
+        # Several gzip members after each other should be decompressed as one body
+        self.assertEqual(
+            self.parse(
+                gzip.compress(body + b"\n") + gzip.compress(body),
+                content_encoding="gzip",
+            ),
+            objs * 2,
+        )
+
+        with self.assertRaises(ParseError):
+            self.parse(gzip.compress(body)[:-10], content_encoding="gzip")
+        with self.assertRaises(ParseError):
+            self.parse(body, content_encoding="gzip")
+        with self.assertRaises(UnsupportedMediaType):
+            self.parse(body, content_encoding="br")
+
+    @override_settings(ALERT_PARSER_MAX_OBJECT_SIZE=10, ALERT_PARSER_MAX_BODY_SIZE=30)
+    def test_ndjson_parser_size_limits(self):
+        self.assertEqual(self.parse(b'{"a": 1}\n' * 3), [{"a": 1}] * 3)
+        with self.assertRaises(ParseError):
+            self.parse(b'{"a": "12345"}')
+        with self.assertRaises(ParseError):
+            self.parse(b'{"a": 1}\n' * 4)
+        # The size limit of the body applies to the decompressed body
+        with self.assertRaises(ParseError):
+            self.parse(gzip.compress(b"\n" * 100), content_encoding="gzip")
+
+
+class TestSerializers(TransactionTestCase):
+    def setUp(self):
+        nav1 = NetworkSystem.objects.create(name="Gløshaugen", type=NetworkSystem.NAV)
+        mappings.create_alerts_from_json(
+            [
+                nav_alert_json(1, 10),
+                nav_alert_json(2, 10, subid="5"),
+                nav_alert_json(3, 11, alert_type="boxUp"),
+                nav_alert_json(4, 10, subid="6"),
+            ],
+            nav1,
+        )
+        zabbix1 = NetworkSystem.objects.create(name="Zabbix", type=NetworkSystem.ZABBIX)
+        alert = Alert.objects.get(alert_id="3")
+        Alert.objects.create(
+            timestamp=timezone.now(),
+            source=zabbix1,
+            alert_id="1",
+            object=alert.object,
+            problem_type=alert.problem_type,
+            description="Æøå",
+            ticket_url="https://example.org/tickets/1",
+        )
+        ActiveAlert.objects.create(alert=alert)
+
+    def test_fast_alert_serializer_output_is_identical(self):
+        queryset = Alert.load_related_fields(Alert.objects.all())
+        self.assertEqual(queryset.count(), 5)
+
+        for context in ({}, {AlertSerializer.NO_PKS_KEY: True}):
+            data = AlertSerializer(queryset, many=True, context=context).data
+            fast_data = FastAlertSerializer(queryset, context=context).data
+            self.assertEqual(fast_data, data)
+            self.assertEqual(
+                JSONRenderer().render(fast_data), JSONRenderer().render(data)
+            )
+
+        # Rows from `.values()` should give the same output as rows from `.values_list()`
+        values_data = FastAlertSerializer(
+            queryset.values(*FastAlertSerializer.ROW_FIELDS)
+        ).data
+        self.assertEqual(values_data, FastAlertSerializer(queryset).data)
+
+        # Rows of alert instances should also give the same output
+        instances_data = FastAlertSerializer(
+            [FastAlertSerializer.get_row_of_alert(alert) for alert in queryset]
+        ).data
+        self.assertEqual(instances_data, FastAlertSerializer(queryset).data)
+
+
+class TestViews(APITransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="asdf")
+        self.client.force_authenticate(user=self.user)
+
+        self.nav1 = NetworkSystem.objects.create(
+            name="Gløshaugen", type=NetworkSystem.NAV
+        )
+        object_type1 = ObjectType.objects.create(name="box")
+        self.object1 = Object.objects.create(name="1", url="", type=object_type1)
+        self.problem_type1 = ProblemType.objects.create(
+            name="boxDown", description="A box is down."
+        )
+
+        now = timezone.now()
+        self.alerts = []
+        # Some of the alerts have equal timestamps
+        for i, minutes_ago in enumerate((0, 1, 1, 1, 2, 3, 3)):
+            alert = Alert.objects.create(
+                timestamp=now - timedelta(minutes=minutes_ago),
+                source=self.nav1,
+                alert_id=str(i),
+                object=self.object1,
+                problem_type=self.problem_type1,
+            )
+            if i % 2 == 0:
+                ActiveAlert.objects.create(alert=alert)
+            self.alerts.append(alert)
+        self.alerts.sort(key=lambda alert: (alert.timestamp, alert.pk), reverse=True)
+
+    def get_pages(self, url: str, link_key="next"):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([alert["pk"] for alert in response.data["results"]])
+            url = response.data[link_key]
+        return pages
+
+    def test_alert_list_pagination(self):
+        response = self.client.get("/api/v1/alerts/")
+        self.assertEqual(len(response.data), len(self.alerts))
+
+        alert_pks = [alert.pk for alert in self.alerts]
+        pages = self.get_pages("/api/v1/alerts/?page_size=2")
+        self.assertEqual(sum(pages, []), alert_pks)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+
+        # Go back from the last page
+        response = self.client.get("/api/v1/alerts/?page_size=2")
+        response = self.client.get(response.data["next"])
+        response = self.client.get(response.data["next"])
+        previous_pages = self.get_pages(response.data["previous"], "previous")
+        self.assertEqual(previous_pages, [alert_pks[2:4], alert_pks[:2]])
+
+        response = self.client.get("/api/v1/alerts/?cursor=invalid")
+        self.assertEqual(response.status_code, 404)
+
+    def test_active_alert_list_pagination(self):
+        active_alert_pks = [
+            alert.pk for alert in self.alerts if alert.alert_id in "0246"
+        ]
+        pages = self.get_pages("/api/v1/alerts/active/?page_size=3")
+        self.assertEqual(sum(pages, []), active_alert_pks)
+
+    @override_settings(ALERT_STREAMING_CHUNK_SIZE=3)
+    def test_streamed_alert_list(self):
+        for url in ("/api/v1/alerts/", "/api/v1/alerts/active/"):
+            for fast_serialization in (True, False):
+                with override_settings(ALERT_FAST_SERIALIZATION=fast_serialization):
+                    response = self.client.get(url)
+                    response.render()
+                    streamed_response = self.client.get(url + "?stream")
+                self.assertTrue(streamed_response.streaming)
+                self.assertEqual(
+                    b"".join(streamed_response.streaming_content), response.content
+                )
+
+    @override_settings(ALERT_INGESTION_BATCH_SIZE=2)
+    def test_post_alerts(self):
+        alerts_json = [nav_alert_json(i, 10) for i in range(100, 105)]
+        body = "\n".join(json.dumps(alert_json) for alert_json in alerts_json)
+        response = self.client.post("/api/v1/alerts/", body, content_type="text/plain")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [alert["alert_id"] for alert in response.data],
+            [str(alert_json["history"]) for alert_json in alerts_json],
+        )
+        self.assertEqual(Alert.objects.filter(alert_id__startswith="10").count(), 5)
+
+        alerts_json = [nav_alert_json(i, 10) for i in range(300, 305)]
+        body = "\n".join(json.dumps(alert_json) for alert_json in alerts_json)
+        response = self.client.post(
+            "/api/v1/alerts/",
+            gzip.compress(body.encode()),
+            content_type="application/x-ndjson",
+            HTTP_CONTENT_ENCODING="gzip",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(Alert.objects.filter(alert_id__startswith="30").count(), 5)
+
+        # None of the alerts should be created if any of them can't be parsed
+        body = "".join(json.dumps(nav_alert_json(i, 10)) for i in range(200, 203)) + "{"
+        response = self.client.post("/api/v1/alerts/", body, content_type="text/plain")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Alert.objects.filter(alert_id__startswith="20").exists())
+
+    @override_settings(ALERT_INGESTION_BATCH_SIZE=2)
+    def test_objects_of_rejected_requests_are_not_cached(self):
+        # The device is created by the first batch, which is rolled back when the last alert is rejected
+        body = "".join(json.dumps(nav_alert_json(i, 77)) for i in (400, 401, 402, 400))
+        response = self.client.post("/api/v1/alerts/", body, content_type="text/plain")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Object.objects.filter(name__contains="example-sw77").exists())
+
+        self.assertEqual(response.data["index"], 3)
+
+        for url in ("/api/v1/alerts/", "/api/v1/alerts/?idempotent"):
+            response = self.client.post(
+                url, json.dumps(nav_alert_json(403, 77)), content_type="text/plain"
+            )
+            self.assertIn(response.status_code, (200, 207))
+            alerts = Alert.objects.filter(alert_id="403")
+            self.assertTrue(
+                alerts.filter(object__name__contains="example-sw77").exists()
+            )
+            alerts.delete()
+
+    @override_settings(ALERT_INGESTION_BATCH_SIZE=2)
+    def test_post_alerts_that_cannot_be_mapped(self):
+        def post_alerts(alerts_json):
+            body = "".join(json.dumps(alert_json) for alert_json in alerts_json)
+            return self.client.post("/api/v1/alerts/", body, content_type="text/plain")
+
+        alerts_json = [nav_alert_json(i, 10) for i in range(500, 505)]
+        del alerts_json[2]["netbox"]
+        response = post_alerts(alerts_json)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["index"], 2)
+        self.assertIn("netbox", response.data["detail"])
+
+        alerts_json[2] = nav_alert_json(502, 10)
+        alerts_json[4]["alert_type"] = "boxDown"
+        response = post_alerts(alerts_json)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["index"], 4)
+        self.assertFalse(Alert.objects.filter(alert_id__startswith="50").exists())
+
+    def test_post_alerts_idempotently(self):
+        def post_alerts(history_ids, url="/api/v1/alerts/?idempotent"):
+            body = "".join(json.dumps(nav_alert_json(i, 10)) for i in history_ids)
+            return self.client.post(url, body, content_type="text/plain")
+
+        response = post_alerts([100, 101])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result["status"] for result in response.data], [201, 201])
+        created_pks = [result["alert"]["pk"] for result in response.data]
+
+        # Retried alerts should be reported as conflicts, without failing the other alerts
+        response = post_alerts([101, 102, 100, 102])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(
+            [result["status"] for result in response.data], [409, 201, 409, 409]
+        )
+        self.assertEqual(response.data[0]["pk"], created_pks[1])
+        self.assertEqual(response.data[2]["pk"], created_pks[0])
+        self.assertEqual(response.data[3]["pk"], response.data[1]["alert"]["pk"])
+        self.assertEqual(
+            Alert.objects.filter(alert_id__in=["100", "101", "102"]).count(), 3
+        )
+
+        # Alerts that can't be created should be reported without failing the other alerts
+        invalid_alert_json = nav_alert_json(105, 10)
+        invalid_alert_json["time"] = "not a timestamp"
+        incomplete_alert_json = nav_alert_json(106, 10)
+        del incomplete_alert_json["alert_type"]
+        body = "".join(
+            json.dumps(alert_json)
+            for alert_json in (
+                nav_alert_json(104, 10),
+                invalid_alert_json,
+                incomplete_alert_json,
+                nav_alert_json(100, 10),
+                nav_alert_json(107, 10),
+            )
+        )
+        response = self.client.post(
+            "/api/v1/alerts/?idempotent", body, content_type="text/plain"
+        )
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(
+            [result["status"] for result in response.data], [201, 400, 400, 409, 201]
+        )
+        self.assertIn("timestamp", response.data[1]["detail"])
+        self.assertIn("alert_type", response.data[2]["detail"])
+        self.assertEqual(
+            set(
+                Alert.objects.filter(
+                    alert_id__in=["104", "105", "106", "107"]
+                ).values_list("alert_id", flat=True)
+            ),
+            {"104", "107"},
+        )
+
+        # Without the query parameter, the whole request should fail
+        response = post_alerts([102, 103], url="/api/v1/alerts/")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Alert.objects.filter(alert_id="103").exists())
+
+    def test_post_alerts_from_network_systems(self):
+        def post_alert(alert_json: dict):
+            return self.client.post(
+                "/api/v1/alerts/", json.dumps(alert_json), content_type="text/plain"
+            )
+
+        # The only network system should be used when the user is not the user of any network system
+        response = post_alert(nav_alert_json(1000, 10))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["source"]["pk"], self.nav1.pk)
+
+        # Otherwise, it's ambiguous
+        nav2 = NetworkSystem.objects.create(name="Moholt", type=NetworkSystem.NAV)
+        response = post_alert(nav_alert_json(1001, 10))
+        self.assertEqual(response.status_code, 403)
+
+        nav2.user = self.user
+        nav2.save()
+        response = post_alert(nav_alert_json(1002, 10))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["source"]["pk"], nav2.pk)
+
+        # The network system should be found without querying the database
+        with CaptureQueriesContext(connection) as context:
+            response = post_alert(nav_alert_json(1003, 10))
+        self.assertEqual(response.data["source"]["pk"], nav2.pk)
+        self.assertFalse(
+            any(
+                NetworkSystem._meta.db_table in query["sql"]
+                for query in context.captured_queries
+            )
+        )
+
+    def test_change_alert_active_state(self):
+        alert = self.alerts[1]
+        self.assertFalse(Alert.objects.get(pk=alert.pk).is_active)
+
+        for active in (True, True, False, False, True):
+            response = self.client.put(
+                f"/api/v1/alerts/{alert.pk}/active", {"active": active}, format="json"
+            )
+            self.assertEqual(response.data["active_state"], active)
+            self.assertEqual(Alert.objects.get(pk=alert.pk).is_active, active)
+            self.assertEqual(ActiveAlert.objects.filter(alert=alert).exists(), active)
+
+        # The active state should also be kept in sync when `ActiveAlert` objects are changed directly
+        ActiveAlert.objects.filter(alert=alert).delete()
+        self.assertFalse(Alert.objects.get(pk=alert.pk).is_active)
+        self.assertNotIn(alert, Alert.get_active_alerts())
+
+    def test_number_of_queries(self):
+        alert_pk = self.alerts[0].pk
+        for fast_serialization in (True, False):
+            with override_settings(ALERT_FAST_SERIALIZATION=fast_serialization):
+                for url in ("/api/v1/alerts/", "/api/v1/alerts/active/"):
+                    with self.assertNumQueries(1):
+                        self.client.get(url)
+                    with self.assertNumQueries(1):
+                        self.client.get(url + "?page_size=2")
+                    with self.assertNumQueries(1):
+                        response = self.client.get(url + "?stream")
+                        b"".join(response.streaming_content)
+
+        with self.assertNumQueries(1):
+            self.client.get(f"/api/v1/alerts/{alert_pk}")
+        with self.assertNumQueries(4):
+            self.client.put(
+                f"/api/v1/alerts/{alert_pk}/active", {"active": False}, format="json"
+            )
+        with self.assertNumQueries(4):
+            self.client.get("/api/v1/alerts/metadata/")
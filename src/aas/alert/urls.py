@@ -10,4 +10,5 @@ urlpatterns = [
     path("<int:alert_pk>/active", views.change_alert_active_view),
     path("source/<int:source_pk>", views.all_alerts_from_source_view, name="source"),
     path("metadata/", views.get_all_meta_data_view),
+    path("cachestats/", views.get_cache_stats_view),
 ]
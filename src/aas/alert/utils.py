@@ -1,10 +1,60 @@
-from typing import Type, Union
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Hashable, Iterable, Iterator, List, Tuple, Type, Union
 
 from django.db import models
+from django.db.models import QuerySet
+from django.db.models.constants import LOOKUP_SEP
 from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor
 from django.db.models.query_utils import DeferredAttribute
 
 
+def chunks(iterable: Iterable, size: int) -> Iterator[List]:
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def plan_related_lookups(
+    model: Type[models.Model], lookups: Iterable[str]
+) -> Tuple[List[str], List[str]]:
+    """
+    Splits the lookups of related objects into the ones that can be loaded by joining them in the same query,
+    and the ones that must be prefetched in separate queries.
+    Forward foreign keys and one-to-one relations in either direction are joined,
+    while the rest of a lookup is prefetched from the first reverse foreign key or many-to-many relation.
+    """
+    select_lookups = []
+    prefetch_lookups = []
+    for lookup in lookups:
+        current_model = model
+        joinable_parts = []
+        for part in lookup.split(LOOKUP_SEP):
+            field = current_model._meta.get_field(part)
+            if not (field.many_to_one or field.one_to_one):
+                prefetch_lookups.append(lookup)
+                break
+            joinable_parts.append(part)
+            current_model = field.related_model
+        if joinable_parts:
+            select_lookups.append(LOOKUP_SEP.join(joinable_parts))
+    return select_lookups, prefetch_lookups
+
+
+def load_related(qs: QuerySet, *lookups: str) -> QuerySet:
+    select_lookups, prefetch_lookups = plan_related_lookups(qs.model, lookups)
+    if select_lookups:
+        qs = qs.select_related(*select_lookups)
+    if prefetch_lookups:
+        qs = qs.prefetch_related(*prefetch_lookups)
+    return qs
+
+
 class MappingUtils:
     @staticmethod
     def remove_none_mappings(field_mappings: dict):
@@ -32,3 +82,69 @@ class MappingUtils:
     def prepare_field_value_getters(model: Type[models.Model], field_mappings: dict):
         for field_name, field_value_getter in field_mappings.items():
             field_value_getter.prepare(field_name, model)
+
+
+class LRUCache:
+    def __init__(self, max_size: int, get_index_key: Callable[..., Hashable] = None):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = Lock()
+        # Reverse index from the index key of each value (e.g. its primary key) to the keys it's cached under
+        self._get_index_key = get_index_key
+        self._keys_by_index_key = {}
+
+    def get(self, key: Hashable):
+        with self._lock:
+            value = self._values.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._values.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value):
+        with self._lock:
+            if key in self._values:
+                self._unindex(key, self._values[key])
+            self._values[key] = value
+            self._values.move_to_end(key)
+            self._index(key, value)
+            while len(self._values) > self.max_size:
+                # Evict the least recently used value
+                self._unindex(*self._values.popitem(last=False))
+
+    def remove_indexed(self, index_key: Hashable):
+        with self._lock:
+            for key in self._keys_by_index_key.pop(index_key, ()):
+                del self._values[key]
+
+    def _index(self, key: Hashable, value):
+        if self._get_index_key:
+            self._keys_by_index_key.setdefault(self._get_index_key(value), set()).add(
+                key
+            )
+
+    def _unindex(self, key: Hashable, value):
+        if self._get_index_key:
+            index_key = self._get_index_key(value)
+            keys = self._keys_by_index_key[index_key]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_index_key[index_key]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._keys_by_index_key.clear()
+
+    @property
+    def stats(self):
+        return {
+            "size": len(self._values),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -1,13 +1,16 @@
 import json
 
+from django.conf import settings
 from django.core import serializers
+from django.db import transaction
 from django.http import HttpResponse
-from rest_framework import generics
-from rest_framework.decorators import api_view
+from rest_framework import generics, status
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
-from aas.notificationprofile.notification_media import send_notifications_to_users
+from aas.notificationprofile.notification_queue import enqueue_notifications
 from . import mappings
 from .models import (
     ActiveAlert,
@@ -17,51 +20,188 @@ from .models import (
     ParentObject,
     ProblemType,
 )
-from .parsers import StackedJSONParser
+from .pagination import AlertCursorPagination
+from .parsers import NDJSONParser, StackedJSONParser
 from .serializers import (
     AlertSerializer,
     NetworkSystemSerializer,
     ObjectTypeSerializer,
     ParentObjectSerializer,
     ProblemTypeSerializer,
+    serialize_alerts,
 )
+from .sources import get_source_of_request
+from .streaming import stream_alerts_response, streaming_requested
+from .utils import chunks
 
+IDEMPOTENT_QUERY_PARAM = "idempotent"
 
-class AlertList(generics.ListCreateAPIView):
-    queryset = Alert.prefetch_related_fields(
-        Alert.objects.select_related("active_state")
-    )
-    parser_classes = [StackedJSONParser]
+
+def idempotent_ingestion_requested(request):
+    value = request.query_params.get(IDEMPOTENT_QUERY_PARAM)
+    return value is not None and value.lower() in {"", "1", "true"}
+
+
+class AlertListMixin:
+    """
+    Streams the listed alerts when the `stream` query parameter is passed,
+    and otherwise paginates them if requested, or serializes them all at once.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if streaming_requested(request):
+            return stream_alerts_response(queryset)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        return Response(serialize_alerts(queryset))
+
+
+class AlertList(AlertListMixin, generics.ListCreateAPIView):
+    queryset = Alert.load_related_fields(Alert.objects.all())
+    parser_classes = [StackedJSONParser, NDJSONParser]
     serializer_class = AlertSerializer
+    pagination_class = AlertCursorPagination
 
     def post(self, request, *args, **kwargs):
-        created_alerts = [
-            mappings.create_alert_from_json(
-                json_dict, NetworkSystem.NAV
-            )  # TODO: interpret network system type from alerts' source IP?
-            for json_dict in request.data
-        ]
+        """
+        Creates the posted alerts, or none of them if any of them can't be parsed or mapped to an alert.
+        The alerts are created in batches while the request body is being received, all in one transaction,
+        which is kept open until the whole body has been received; post large numbers of alerts idempotently
+        (with the `idempotent` query parameter) instead, to commit each batch by itself.
+        """
+        if idempotent_ingestion_requested(request):
+            return self.post_idempotently(request)
+
+        batch_size = getattr(settings, "ALERT_INGESTION_BATCH_SIZE", 1000)
+        alerts_data = []
+        source = get_source_of_request(request)
+        with transaction.atomic():
+            for json_dicts in chunks(request.data, batch_size):
+                try:
+                    created_alerts = mappings.create_alerts_from_json(
+                        json_dicts, source
+                    )
+                except mappings.MAPPING_ERRORS as e:
+                    index, error = self.find_failing_alert(json_dicts, source, e)
+                    transaction.set_rollback(True)
+                    return Response(
+                        {
+                            "index": len(alerts_data) + index,
+                            "detail": mappings.get_mapping_error_detail(error),
+                        },
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
 
-        for created_alert in created_alerts:
-            send_notifications_to_users(created_alert)
+                enqueue_notifications(created_alerts)
+                alerts_data.extend(AlertSerializer(created_alerts, many=True).data)
 
-        if len(created_alerts) == 1:
-            serializer = AlertSerializer(created_alerts[0])
-        else:
-            serializer = AlertSerializer(created_alerts, many=True)
-        return Response(serializer.data)
+        if len(alerts_data) == 1:
+            return Response(alerts_data[0])
+        return Response(alerts_data)
+
+    @staticmethod
+    def find_failing_alert(json_dicts: list, source: NetworkSystem, error: Exception):
+        """
+        Returns the index in the batch of the first dict that can't be mapped to an alert, and its error,
+        by creating the alerts one by one in a savepoint that is rolled back afterwards.
+        """
+        savepoint = transaction.savepoint()
+        try:
+            for i, json_dict in enumerate(json_dicts):
+                try:
+                    mappings.create_alerts_from_json([json_dict], source)
+                except mappings.MAPPING_ERRORS as e:
+                    return i, e
+        finally:
+            transaction.savepoint_rollback(savepoint)
+        # Creating the alerts one by one did not reproduce the error of the batch
+        return 0, error
+
+    def post_idempotently(self, request):
+        """
+        Creates the posted alerts that don't already exist, so that a network system can safely retry posting alerts.
+        Responds with the status of each posted alert, in the order they were posted.
+        """
+        batch_size = getattr(settings, "ALERT_INGESTION_BATCH_SIZE", 1000)
+        results = []
+        source = get_source_of_request(request)
+        for json_dicts in chunks(request.data, batch_size):
+            # Each batch is committed by itself, as the alerts of committed batches are skipped
+            # if the request is retried after failing to parse a later batch
+            with transaction.atomic():
+                results.extend(self.create_batch_idempotently(json_dicts, source))
+
+        return Response(results, status=status.HTTP_207_MULTI_STATUS)
+
+    @staticmethod
+    def create_batch_idempotently(json_dicts: list, source: NetworkSystem):
+        errors = {}
+        try:
+            with transaction.atomic():
+                alerts_and_created = (
+                    mappings.create_alerts_from_json_ignoring_duplicates(
+                        json_dicts, source
+                    )
+                )
+        except mappings.MAPPING_ERRORS:
+            # Create the alerts one by one instead, each in its own savepoint,
+            # so that only the alerts that can't be created are rolled back
+            alerts_and_created = []
+            for i, json_dict in enumerate(json_dicts):
+                try:
+                    with transaction.atomic():
+                        alerts_and_created.extend(
+                            mappings.create_alerts_from_json_ignoring_duplicates(
+                                [json_dict], source
+                            )
+                        )
+                except mappings.MAPPING_ERRORS as e:
+                    errors[i] = mappings.get_mapping_error_detail(e)
+                    alerts_and_created.append((None, False))
+
+        created_alerts = [alert for alert, created in alerts_and_created if created]
+        enqueue_notifications(created_alerts)
+        created_alerts_data = iter(AlertSerializer(created_alerts, many=True).data)
+        results = []
+        for i, (alert, created) in enumerate(alerts_and_created):
+            if i in errors:
+                results.append(
+                    {"status": status.HTTP_400_BAD_REQUEST, "detail": errors[i]}
+                )
+            elif created:
+                results.append(
+                    {
+                        "status": status.HTTP_201_CREATED,
+                        "alert": next(created_alerts_data),
+                    }
+                )
+            else:
+                results.append(
+                    {
+                        "status": status.HTTP_409_CONFLICT,
+                        "detail": f"Alert with the alert_id '{alert.alert_id}' already exists"
+                        f" for the NetworkSystem '{source}'.",
+                        "pk": alert.pk,
+                    }
+                )
+        return results
 
 
 class AlertDetail(generics.RetrieveAPIView):
-    queryset = Alert.objects.all()
+    queryset = Alert.load_related_fields(Alert.objects.all())
     serializer_class = AlertSerializer
 
 
-class ActiveAlertList(generics.ListAPIView):
+class ActiveAlertList(AlertListMixin, generics.ListAPIView):
     serializer_class = AlertSerializer
+    pagination_class = AlertCursorPagination
 
     def get_queryset(self):
-        return Alert.prefetch_related_fields(Alert.get_active_alerts())
+        return Alert.load_related_fields(Alert.get_active_alerts())
 
 
 @api_view(["PUT"])
@@ -75,16 +215,13 @@ def change_alert_active_view(request, alert_pk):
             "Field 'active' with a boolean value is missing from the request body."
         )
 
-    alert = Alert.objects.get(pk=alert_pk)
+    alert = Alert.load_related_fields(Alert.objects.all()).get(pk=alert_pk)
+    # `alert.is_active` is updated when the `ActiveAlert` object is created or deleted
     if new_active_state:
         ActiveAlert.objects.get_or_create(alert=alert)
-    else:
-        if hasattr(alert, "active_state"):
-            alert.active_state.delete()
+    elif alert.is_active:
+        ActiveAlert(alert=alert).delete()
 
-    alert = Alert.objects.get(
-        pk=alert_pk
-    )  # re-fetch the alert to get updated state after creating/deleting ActiveAlert object
     serializer = AlertSerializer(alert)
     return Response(serializer.data)
 
@@ -110,3 +247,10 @@ def get_all_meta_data_view(request):
         "problemTypes": problem_types.data,
     }
     return Response(data)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def get_cache_stats_view(request):
+    # The stats are for the caches of the process that handles the request
+    return Response(mappings.ForeignKeyField.get_cache_stats())
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.db.models.functions import Concat
 from django.utils.html import format_html_join
 
-from .models import Filter, NotificationProfile, TimeInterval, TimeSlot
+from .models import Filter, NotificationJob, NotificationProfile, TimeInterval, TimeSlot
 
 
 class TimeSlotAdmin(admin.ModelAdmin):
@@ -77,6 +77,26 @@ class NotificationProfileAdmin(admin.ModelAdmin):
     get_media.admin_order_field = "media"
 
 
+class NotificationJobAdmin(admin.ModelAdmin):
+    list_display = ("get_str", "created", "next_attempt", "attempts", "failed")
+    list_filter = ("failed", "medium")
+    search_fields = ("alert__alert_id", "user__username")
+    list_select_related = (
+        "alert__problem_type",
+        "alert__object__type",
+        "alert__object__network_system",
+        "user",
+    )
+
+    raw_id_fields = ("alert", "user")
+
+    def get_str(self, notification_job):
+        return str(notification_job)
+
+    get_str.short_description = "Notification job"
+
+
 admin.site.register(TimeSlot, TimeSlotAdmin)
 admin.site.register(Filter, FilterAdmin)
 admin.site.register(NotificationProfile, NotificationProfileAdmin)
+admin.site.register(NotificationJob, NotificationJobAdmin)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from aas.notificationprofile.matchers import profile_index
+from aas.notificationprofile.models import Filter
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the criterion tables of all filters from their filter strings,"
+        " e.g. after the filter strings have been changed without saving the filters one by one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "filter_pks",
+            nargs="*",
+            type=int,
+            metavar="filter_pk",
+            help="Primary key of a filter to rebuild the criteria of. Defaults to all filters.",
+        )
+
+    def handle(self, *args, **options):
+        filters = Filter.objects.order_by("pk")
+        if options["filter_pks"]:
+            filters = filters.filter(pk__in=options["filter_pks"])
+
+        with transaction.atomic():
+            filter_pks = []
+            for filter_ in filters.iterator():
+                filter_.save_criteria()
+                filter_pks.append(filter_.pk)
+            # The in-memory index of other processes might also have missed the changed filter strings
+            profile_index.mark_filters_changed(filter_pks)
+
+        self.stdout.write(f"Rebuilt the criteria of {len(filter_pks)} filters.")
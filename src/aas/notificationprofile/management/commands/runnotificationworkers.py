@@ -0,0 +1,70 @@
+import json
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from aas.notificationprofile.notification_queue import get_queue_stats, run_worker
+
+
+class Command(BaseCommand):
+    help = "Starts worker processes that send the queued notifications about posted alerts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of worker processes to start.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Max number of queued jobs that a worker claims at a time.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Number of seconds to wait before checking an empty queue again.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the jobs that are currently due, and then exit.",
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Print the number of queued jobs as JSON, and then exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(json.dumps(get_queue_stats()))
+            return
+
+        worker_kwargs = {
+            "batch_size": options["batch_size"],
+            "poll_interval": options["poll_interval"],
+            "stop_when_empty": options["once"],
+        }
+        if options["workers"] == 1:
+            run_worker(**worker_kwargs)
+            return
+
+        # Database connections must not be shared with the forked processes
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=run_worker, kwargs=worker_kwargs)
+            for _ in range(options["workers"])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
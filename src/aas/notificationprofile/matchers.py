@@ -0,0 +1,405 @@
+import time
+from collections import defaultdict
+from datetime import datetime
+from threading import RLock
+from typing import Dict, Iterable, List, NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from aas.alert.models import Alert
+from .models import (
+    FILTER_CRITERION_MODELS,
+    Filter,
+    NotificationProfile,
+    TimeInterval,
+    TimeSlot,
+)
+from .utils import get_week_offset
+
+# Incremented whenever filters, time slots or notification profiles change, so that other processes can detect it
+INDEX_VERSION_CACHE_KEY = "notificationprofile:profile_index_version"
+
+
+class CompiledFilter:
+    def __init__(self, filter_: Filter):
+        self.pk = filter_.pk
+        # Only the fields that restrict which alerts fit the filter; an empty list means "any"
+        self.criteria = filter_.criteria
+
+
+class CompiledProfile:
+    def __init__(self, profile: NotificationProfile):
+        self.pk = profile.pk
+        self.user_id = profile.user_id
+        self.media = list(profile.media)
+        self.active = profile.active
+        self.filter_pks = {filter_.pk for filter_ in profile.filters.all()}
+        self.schedule = profile.time_slot.get_schedule()
+
+    def local_timestamp_is_within_time_intervals(self, local_timestamp: datetime):
+        return self.schedule.contains_local_timestamp(local_timestamp)
+
+
+class NotificationProfileIndex:
+    """
+    An in-memory index of all notification profiles and their filters,
+    for finding the profiles that an alert fits without querying the database.
+    Changes to filters, time slots and notification profiles made in this process are applied incrementally,
+    while changes made in other processes are detected through the cache and by rebuilding the index periodically.
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._reset()
+
+    def _reset(self):
+        self._built_at = None
+        self._version = None
+        self._dirty_filter_pks = set()
+        self._dirty_profile_pks = set()
+
+        self.filters = {}
+        self.profiles = {}
+        # Inverted index from each filter field and value, to the filters that are restricted to the value
+        self._filter_pks_per_value = {
+            filter_field_name: defaultdict(set)
+            for filter_field_name in Filter.FILTER_STRING_FIELDS
+        }
+        self._unrestricted_filter_pks = set()
+        self._profile_pks_per_filter_pk = defaultdict(set)
+        # Shared between the profiles with equal time intervals, e.g. the default "Immediately" time slots
+        self._schedules = {}
+
+    def get_matching_profiles(self, alert: Alert) -> List[CompiledProfile]:
+        with self._lock:
+            self._refresh()
+
+            alert_values = {}
+            for filter_field_name, attr_getter in Filter.FILTER_STRING_FIELDS.items():
+                alert_attr = attr_getter(alert)
+                alert_values[filter_field_name] = (
+                    alert_attr.pk if alert_attr is not None else None
+                )
+
+            profile_pks = set()
+            for filter_pk in self._get_matching_filter_pks(alert_values):
+                profile_pks.update(self._profile_pks_per_filter_pk[filter_pk])
+
+            # The timestamp is converted once, and each distinct schedule is only checked once
+            week_offset = get_week_offset(
+                alert.timestamp.astimezone(timezone.get_current_timezone())
+            )
+            schedule_contains_timestamp = {}
+            matching_profiles = []
+            for profile in (self.profiles[pk] for pk in profile_pks):
+                if not profile.active:
+                    continue
+                contains_timestamp = schedule_contains_timestamp.get(profile.schedule)
+                if contains_timestamp is None:
+                    contains_timestamp = schedule_contains_timestamp[
+                        profile.schedule
+                    ] = profile.schedule.contains(week_offset)
+                if contains_timestamp:
+                    matching_profiles.append(profile)
+            return matching_profiles
+
+    def _get_matching_filter_pks(self, alert_values: dict):
+        # Count the number of restricted fields of each filter that the alert's values fit
+        num_fitting_fields_per_filter_pk = defaultdict(int)
+        for filter_field_name, value in alert_values.items():
+            for filter_pk in self._filter_pks_per_value[filter_field_name].get(
+                value, ()
+            ):
+                num_fitting_fields_per_filter_pk[filter_pk] += 1
+
+        matching_filter_pks = set(self._unrestricted_filter_pks)
+        matching_filter_pks.update(
+            filter_pk
+            for filter_pk, num_fitting_fields in num_fitting_fields_per_filter_pk.items()
+            if num_fitting_fields == len(self.filters[filter_pk].criteria)
+        )
+        return matching_filter_pks
+
+    def get_profile_pks_with_filter(self, filter_pk: int):
+        with self._lock:
+            return set(self._profile_pks_per_filter_pk.get(filter_pk, ()))
+
+    def mark_filters_changed(self, filter_pks: Iterable[int]):
+        filter_pks = set(filter_pks)
+        self._mark_changed(filter_pks, ())
+        # Other processes and threads might have refreshed the index before the change was committed
+        transaction.on_commit(lambda: self._mark_changed(filter_pks, ()))
+
+    def mark_profiles_changed(self, profile_pks: Iterable[int]):
+        profile_pks = set(profile_pks)
+        self._mark_changed((), profile_pks)
+        transaction.on_commit(lambda: self._mark_changed((), profile_pks))
+
+    def _mark_changed(self, filter_pks: Iterable[int], profile_pks: Iterable[int]):
+        with self._lock:
+            self._dirty_filter_pks.update(filter_pks)
+            self._dirty_profile_pks.update(profile_pks)
+            self._bump_version()
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def _bump_version(self):
+        try:
+            version = cache.incr(INDEX_VERSION_CACHE_KEY)
+        except ValueError:
+            version = 1
+            cache.set(INDEX_VERSION_CACHE_KEY, version, timeout=None)
+
+        if self._version is not None and version != self._version + 1:
+            # Another process has also changed something
+            self._built_at = None
+        self._version = version
+
+    def _refresh(self):
+        max_age = getattr(settings, "NOTIFICATION_PROFILE_INDEX_MAX_AGE", 60)
+        if (
+            self._built_at is None
+            or time.monotonic() - self._built_at > max_age
+            or cache.get(INDEX_VERSION_CACHE_KEY) != self._version
+        ):
+            self._build()
+            return
+
+        if self._dirty_filter_pks:
+            filter_pks = self._dirty_filter_pks
+            self._dirty_filter_pks = set()
+            filters = Filter.objects.in_bulk(filter_pks)
+            for filter_pk in filter_pks:
+                self._remove_filter(filter_pk)
+                if filter_pk in filters:
+                    self._add_filter(filters[filter_pk])
+
+        if self._dirty_profile_pks:
+            profile_pks = self._dirty_profile_pks
+            self._dirty_profile_pks = set()
+            profiles = self._get_profile_queryset().in_bulk(profile_pks)
+            for profile_pk in profile_pks:
+                self._remove_profile(profile_pk)
+                if profile_pk in profiles:
+                    self._add_profile(profiles[profile_pk])
+
+    def _build(self):
+        self._reset()
+        self._version = cache.get(INDEX_VERSION_CACHE_KEY)
+        for filter_ in Filter.objects.all():
+            self._add_filter(filter_)
+        for profile in self._get_profile_queryset():
+            self._add_profile(profile)
+        self._built_at = time.monotonic()
+
+    @staticmethod
+    def _get_profile_queryset():
+        return NotificationProfile.objects.select_related("time_slot").prefetch_related(
+            "time_slot__time_intervals", "filters"
+        )
+
+    def _add_filter(self, filter_: Filter):
+        compiled_filter = CompiledFilter(filter_)
+        self.filters[compiled_filter.pk] = compiled_filter
+        if not compiled_filter.criteria:
+            self._unrestricted_filter_pks.add(compiled_filter.pk)
+        for filter_field_name, values in compiled_filter.criteria.items():
+            for value in values:
+                self._filter_pks_per_value[filter_field_name][value].add(
+                    compiled_filter.pk
+                )
+
+    def _remove_filter(self, filter_pk: int):
+        compiled_filter = self.filters.pop(filter_pk, None)
+        if compiled_filter is None:
+            return
+        self._unrestricted_filter_pks.discard(filter_pk)
+        for filter_field_name, values in compiled_filter.criteria.items():
+            filter_pks_per_value = self._filter_pks_per_value[filter_field_name]
+            for value in values:
+                filter_pks_per_value[value].discard(filter_pk)
+                if not filter_pks_per_value[value]:
+                    del filter_pks_per_value[value]
+
+    def _add_profile(self, profile: NotificationProfile):
+        compiled_profile = CompiledProfile(profile)
+        compiled_profile.schedule = self._schedules.setdefault(
+            compiled_profile.schedule.key, compiled_profile.schedule
+        )
+        self.profiles[compiled_profile.pk] = compiled_profile
+        for filter_pk in compiled_profile.filter_pks:
+            self._profile_pks_per_filter_pk[filter_pk].add(compiled_profile.pk)
+
+    def _remove_profile(self, profile_pk: int):
+        compiled_profile = self.profiles.pop(profile_pk, None)
+        if compiled_profile is None:
+            return
+        for filter_pk in compiled_profile.filter_pks:
+            self._profile_pks_per_filter_pk[filter_pk].discard(profile_pk)
+            if not self._profile_pks_per_filter_pk[filter_pk]:
+                del self._profile_pks_per_filter_pk[filter_pk]
+
+
+profile_index = NotificationProfileIndex()
+
+
+class MatchedProfile(NamedTuple):
+    pk: int
+    user_id: int
+    media: List[str]
+
+
+# The alerts are matched in chunks, to stay below the max number of query parameters of e.g. SQLite
+SQL_MATCHING_CHUNK_SIZE = 100
+
+
+def get_matching_profiles_in_sql(
+    alert_pks: Iterable[int],
+) -> Dict[int, List[MatchedProfile]]:
+    """
+    Returns the active notification profiles that each of the alerts matches, as found by the database,
+    by joining the alerts with the filter criteria, the notification profiles and their time intervals.
+    Takes one query to load the alerts, and one query per chunk of alerts,
+    so that matching a batch of alerts grows with the number of matches,
+    instead of with the number of profiles times the number of alerts.
+    """
+    alert_pks = list(alert_pks)
+    matching_profiles_per_alert_pk = {alert_pk: [] for alert_pk in alert_pks}
+    alert_rows = Alert.objects.filter(pk__in=alert_pks).values_list(
+        "pk",
+        "timestamp",
+        *(attr_getter.query for attr_getter in Filter.FILTER_STRING_FIELDS.values()),
+    )
+    # The alerts' local days and times are compared with the time intervals, which are in local time
+    current_timezone = timezone.get_current_timezone()
+    alert_params = []
+    for alert_pk, timestamp, *alert_values in alert_rows.iterator():
+        local_timestamp = timestamp.astimezone(current_timezone)
+        day, _day_name = TimeInterval.DAY_CHOICES[local_timestamp.weekday()]
+        alert_params.append(
+            [
+                alert_pk,
+                *alert_values,
+                day,
+                connection.ops.adapt_timefield_value(local_timestamp.time()),
+            ]
+        )
+
+    media_field = NotificationProfile._meta.get_field("media")
+    with connection.cursor() as cursor:
+        for i in range(0, len(alert_params), SQL_MATCHING_CHUNK_SIZE):
+            chunk = alert_params[i : i + SQL_MATCHING_CHUNK_SIZE]
+            cursor.execute(
+                _get_matching_sql(len(chunk)),
+                [param for params in chunk for param in params] + [True],
+            )
+            for alert_pk, profile_pk, user_pk, media in cursor.fetchall():
+                matching_profiles_per_alert_pk[alert_pk].append(
+                    MatchedProfile(
+                        profile_pk, user_pk, list(media_field.to_python(media))
+                    )
+                )
+    return matching_profiles_per_alert_pk
+
+
+def _get_matching_sql(num_alerts: int):
+    quote_name = connection.ops.quote_name
+
+    def table(model):
+        return quote_name(model._meta.db_table)
+
+    def column(model, field_name):
+        return quote_name(model._meta.get_field(field_name).column)
+
+    Profile = NotificationProfile
+    ProfileFilter = NotificationProfile.filters.through
+    value_columns = [f"value{i}" for i in range(len(Filter.FILTER_STRING_FIELDS))]
+
+    # For each filter field, either the filter does not restrict it, or the alert's value is one of its criteria
+    criteria_conditions = []
+    for filter_field_name, value_column in zip(
+        Filter.FILTER_STRING_FIELDS, value_columns
+    ):
+        Criterion = FILTER_CRITERION_MODELS[filter_field_name]
+        criteria_of_filter = (
+            f"SELECT 1 FROM {table(Criterion)} c"
+            f" WHERE c.{column(Criterion, 'filter')} = pf.{column(ProfileFilter, 'filter')}"
+        )
+        criteria_conditions.append(
+            f"(NOT EXISTS ({criteria_of_filter})"
+            f" OR EXISTS ({criteria_of_filter} AND c.{column(Criterion, 'value')} = a.{value_column}))"
+        )
+
+    # The pks are cast, as the type of a column of only NULLs is not inferred as an integer on e.g. PostgreSQL
+    alert_row = (
+        f"({', '.join(['CAST(%s AS INTEGER)'] * (1 + len(value_columns)))}, %s, %s)"
+    )
+    return (
+        f"WITH a (alert_pk, {', '.join(value_columns)}, day, local_time)"
+        f" AS (VALUES {', '.join([alert_row] * num_alerts)})"
+        f" SELECT DISTINCT a.alert_pk, p.{column(Profile, 'time_slot')}, p.{column(Profile, 'user')},"
+        f" p.{column(Profile, 'media')}"
+        f" FROM a"
+        f" INNER JOIN {table(TimeInterval)} ti ON ti.{column(TimeInterval, 'day')} = a.day"
+        f" AND ti.{column(TimeInterval, 'start')} <= a.local_time AND a.local_time <= ti.{column(TimeInterval, 'end')}"
+        f" INNER JOIN {table(Profile)} p ON p.{column(Profile, 'time_slot')} = ti.{column(TimeInterval, 'time_slot')}"
+        f" INNER JOIN {table(ProfileFilter)} pf"
+        f" ON pf.{column(ProfileFilter, 'notificationprofile')} = p.{column(Profile, 'time_slot')}"
+        f" WHERE p.{column(Profile, 'active')} = %s AND {' AND '.join(criteria_conditions)}"
+    )
+
+
+@receiver([post_save, post_delete], sender=Filter)
+def _update_index_on_filter_change(sender, instance: Filter, **kwargs):
+    profile_index.mark_filters_changed([instance.pk])
+    # Deleting a filter removes it from its notification profiles without sending `m2m_changed`
+    profile_index.mark_profiles_changed(
+        profile_index.get_profile_pks_with_filter(instance.pk)
+    )
+
+
+@receiver([post_save, post_delete], sender=NotificationProfile)
+def _update_index_on_profile_change(sender, instance: NotificationProfile, **kwargs):
+    profile_index.mark_profiles_changed([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=TimeSlot)
+def _update_index_on_time_slot_change(sender, instance: TimeSlot, **kwargs):
+    # A notification profile's pk is the pk of its time slot
+    profile_index.mark_profiles_changed([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=TimeInterval)
+def _update_index_on_time_interval_change(sender, instance: TimeInterval, **kwargs):
+    profile_index.mark_profiles_changed([instance.time_slot_id])
+
+
+@receiver(m2m_changed, sender=NotificationProfile.filters.through)
+def _update_index_on_profile_filters_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if not action.startswith("post_"):
+        return
+
+    if not reverse:
+        profile_index.mark_profiles_changed([instance.pk])
+    elif pk_set is not None:
+        profile_index.mark_profiles_changed(pk_set)
+    else:
+        # All of the filter's notification profiles were cleared
+        profile_index.mark_profiles_changed(
+            profile_index.get_profile_pks_with_filter(instance.pk)
+        )
+
+
+@receiver(post_migrate)
+def _invalidate_index(sender, **kwargs):
+    # The database might have been flushed, which does not send any delete signals
+    profile_index.invalidate()
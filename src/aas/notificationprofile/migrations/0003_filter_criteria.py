@@ -0,0 +1,87 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import json
+
+CRITERION_MODEL_NAMES = {
+    'sourceIds': 'FilterSource',
+    'objectTypeIds': 'FilterObjectType',
+    'parentObjectIds': 'FilterParentObject',
+    'problemTypeIds': 'FilterProblemType',
+}
+
+
+def create_filter_criteria(apps, schema_editor):
+    Filter = apps.get_model('aas_notoprofile', 'Filter')
+    for filter_ in Filter.objects.all():
+        try:
+            json_dict = json.loads(filter_.filter_string)
+        except ValueError:
+            continue
+        for filter_field_name, model_name in CRITERION_MODEL_NAMES.items():
+            criterion_model = apps.get_model('aas_notoprofile', model_name)
+            criterion_model.objects.bulk_create(
+                criterion_model(filter=filter_, value_id=value)
+                for value in sorted(set(json_dict.get(filter_field_name) or ()))
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aas_alert', '0005_networksystem_user'),
+        ('aas_notoprofile', '0002_notificationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilterSource',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='source_criteria', to='aas_notoprofile.Filter')),
+                ('value', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='aas_alert.NetworkSystem')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FilterProblemType',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='problem_type_criteria', to='aas_notoprofile.Filter')),
+                ('value', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='aas_alert.ProblemType')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FilterParentObject',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parent_object_criteria', to='aas_notoprofile.Filter')),
+                ('value', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='aas_alert.ParentObject')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FilterObjectType',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='object_type_criteria', to='aas_notoprofile.Filter')),
+                ('value', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='aas_alert.ObjectType')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='filtersource',
+            constraint=models.UniqueConstraint(fields=('filter', 'value'), name='filtersource_unique_value'),
+        ),
+        migrations.AddConstraint(
+            model_name='filterproblemtype',
+            constraint=models.UniqueConstraint(fields=('filter', 'value'), name='filterproblemtype_unique_value'),
+        ),
+        migrations.AddConstraint(
+            model_name='filterparentobject',
+            constraint=models.UniqueConstraint(fields=('filter', 'value'), name='filterparentobject_unique_value'),
+        ),
+        migrations.AddConstraint(
+            model_name='filterobjecttype',
+            constraint=models.UniqueConstraint(fields=('filter', 'value'), name='filterobjecttype_unique_value'),
+        ),
+        migrations.RunPython(create_filter_criteria, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,23 @@
 import json
 from datetime import datetime, time
+from typing import Dict, FrozenSet
 
-from django.db import models
-from django.db.models import Q
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models import Q, QuerySet
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 from multiselectfield import MultiSelectField
 
-from aas.alert.models import Alert
+from aas.alert.models import (
+    Alert,
+    NetworkSystem,
+    ObjectType,
+    ParentObject,
+    ProblemType,
+)
 from aas.auth.models import User
-from .utils import AttrGetter, NestedAttrGetter
+from .utils import AttrGetter, NestedAttrGetter, WeeklySchedule
 
 
 class TimeSlot(models.Model):
@@ -28,10 +35,14 @@ class TimeSlot(models.Model):
     name = models.CharField(max_length=40)
 
     def timestamp_is_within_time_intervals(self, timestamp: datetime):
-        for time_interval in self.time_intervals.all():
-            if time_interval.timestamp_is_within(timestamp):
-                return True
-        return False
+        local_timestamp = timestamp.astimezone(timezone.get_current_timezone())
+        return self.get_schedule().contains_local_timestamp(local_timestamp)
+
+    def get_schedule(self):
+        return WeeklySchedule(
+            (time_interval.isoweekday, time_interval.start, time_interval.end)
+            for time_interval in self.time_intervals.all()
+        )
 
     def __str__(self):
         return self.name
@@ -93,7 +104,7 @@ class TimeInterval(models.Model):
         return self.DAY_NAME_TO_INDEX[self.day]
 
     def timestamp_is_within(self, timestamp: datetime):
-        # FIXME: Might affect performance negatively if calling this method frequently
+        # Checking many timestamps or intervals should instead be done with a `WeeklySchedule`
         timestamp = timestamp.astimezone(timezone.get_current_timezone())
         return (
             timestamp.isoweekday() == self.isoweekday
@@ -140,36 +151,187 @@ class Filter(models.Model):
     def filter_json(self):
         return json.loads(self.filter_string)
 
+    @property
+    def criteria(self) -> Dict[str, FrozenSet[int]]:
+        """
+        The pks that each filter field restricts alerts to, parsed once per filter string;
+        the fields that don't restrict alerts (i.e. with an empty list) are left out.
+        """
+        cached_criteria = getattr(self, "_criteria", None)
+        if cached_criteria is None or cached_criteria[0] != self.filter_string:
+            json_dict = self.filter_json
+            criteria = {
+                filter_field_name: frozenset(json_dict[filter_field_name])
+                for filter_field_name in self.FILTER_STRING_FIELDS
+                if json_dict[filter_field_name]
+            }
+            cached_criteria = self._criteria = (self.filter_string, criteria)
+        return cached_criteria[1]
+
     @property
     def filtered_alerts(self):
-        return Alert.prefetch_related_fields(
+        return Alert.load_related_fields(
             Alert.objects.filter(self.get_alert_query())
         )
 
+    @classmethod
+    def get_filters_fitting_alert(cls, alert: Alert) -> QuerySet:
+        """
+        Returns the filters that the alert fits, looked up in the database through the criterion tables.
+        """
+        filter_query = Q()
+        for filter_field_name, attr_getter in cls.FILTER_STRING_FIELDS.items():
+            alert_attr = attr_getter(alert)
+            restricting_criteria = FILTER_CRITERION_MODELS[
+                filter_field_name
+            ].objects.values("filter")
+            filter_query &= ~Q(pk__in=restricting_criteria) | Q(
+                pk__in=restricting_criteria.filter(
+                    value=alert_attr.pk if alert_attr is not None else None
+                )
+            )
+        return cls.objects.filter(filter_query)
+
     def get_alert_query(self):
-        json_dict = self.filter_json
         alert_query = Q()
-        for filter_field_name, attr_getter in self.FILTER_STRING_FIELDS.items():
-            filter_field_value_list = json_dict[filter_field_name]
-            if filter_field_value_list:
-                alert_arg = {f"{attr_getter.query}__in": filter_field_value_list}
-                alert_query &= Q(**alert_arg)
+        for filter_field_name, filter_field_values in self.criteria.items():
+            attr_getter = self.FILTER_STRING_FIELDS[filter_field_name]
+            alert_arg = {f"{attr_getter.query}__in": sorted(filter_field_values)}
+            alert_query &= Q(**alert_arg)
         return alert_query
 
     def alert_fits(self, alert: Alert):
-        json_dict = self.filter_json
-        for filter_field_name, attr_getter in self.FILTER_STRING_FIELDS.items():
-            filter_field_value_set = set(json_dict[filter_field_name])
-            if filter_field_value_set:
-                alert_attr = attr_getter(alert)
-                if alert_attr.pk not in filter_field_value_set:
-                    return False
+        for filter_field_name, filter_field_values in self.criteria.items():
+            alert_attr = self.FILTER_STRING_FIELDS[filter_field_name](alert)
+            if alert_attr.pk not in filter_field_values:
+                return False
         return True
 
+    def save_criteria(self):
+        """
+        Replaces the filter's rows in the criterion tables with the criteria of its filter string.
+        """
+        criteria = self.criteria
+        with transaction.atomic():
+            for filter_field_name, criterion_model in FILTER_CRITERION_MODELS.items():
+                criterion_model.objects.filter(filter=self).delete()
+                criterion_model.objects.bulk_create(
+                    criterion_model(filter=self, value_id=value)
+                    for value in sorted(criteria.get(filter_field_name, ()))
+                )
+
     def __str__(self):
         return f"{self.name} [{self.filter_string}]"
 
 
+class FilterCriterion(models.Model):
+    """
+    A pk that a filter restricts one of the fields of alerts to, with one table per filter field,
+    so that the database can look up the filters that an alert fits, or that mention an object.
+    The rows are written from the filter string whenever the filter is saved (also by `loaddata`);
+    after changing filter strings without sending `post_save` (e.g. through `QuerySet.update()`),
+    the rows must be rebuilt with the `rebuildfiltercriteria` management command.
+    """
+
+    class Meta:
+        abstract = True
+
+    # No database constraint on the values, as filter strings can keep referring to deleted objects
+    VALUE_FIELD_KWARGS = {
+        "on_delete": models.DO_NOTHING,
+        "db_constraint": False,
+        "related_name": "+",
+    }
+
+    def __str__(self):
+        return f"{self.filter_id}: {self.value_id}"
+
+
+class FilterSource(FilterCriterion):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["filter", "value"], name="filtersource_unique_value"
+            ),
+        ]
+
+    filter = models.ForeignKey(
+        to=Filter, on_delete=models.CASCADE, related_name="source_criteria"
+    )
+    value = models.ForeignKey(to=NetworkSystem, **FilterCriterion.VALUE_FIELD_KWARGS)
+
+
+class FilterObjectType(FilterCriterion):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["filter", "value"], name="filterobjecttype_unique_value"
+            ),
+        ]
+
+    filter = models.ForeignKey(
+        to=Filter, on_delete=models.CASCADE, related_name="object_type_criteria"
+    )
+    value = models.ForeignKey(to=ObjectType, **FilterCriterion.VALUE_FIELD_KWARGS)
+
+
+class FilterParentObject(FilterCriterion):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["filter", "value"], name="filterparentobject_unique_value"
+            ),
+        ]
+
+    filter = models.ForeignKey(
+        to=Filter, on_delete=models.CASCADE, related_name="parent_object_criteria"
+    )
+    value = models.ForeignKey(to=ParentObject, **FilterCriterion.VALUE_FIELD_KWARGS)
+
+
+class FilterProblemType(FilterCriterion):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["filter", "value"], name="filterproblemtype_unique_value"
+            ),
+        ]
+
+    filter = models.ForeignKey(
+        to=Filter, on_delete=models.CASCADE, related_name="problem_type_criteria"
+    )
+    value = models.ForeignKey(to=ProblemType, **FilterCriterion.VALUE_FIELD_KWARGS)
+
+
+# The criterion table of each of the keys of `Filter.FILTER_STRING_FIELDS`
+FILTER_CRITERION_MODELS = {
+    "sourceIds": FilterSource,
+    "objectTypeIds": FilterObjectType,
+    "parentObjectIds": FilterParentObject,
+    "problemTypeIds": FilterProblemType,
+}
+
+
+@receiver(post_save, sender=Filter)
+def _save_filter_criteria(sender, instance: Filter, update_fields, **kwargs):
+    # Also when loading fixtures (`raw`), as they might not include the criterion rows derived from the filter strings
+    if update_fields is None or "filter_string" in update_fields:
+        instance.save_criteria()
+
+
+def _remove_loaded_filter_criterion(sender, instance: FilterCriterion, raw, **kwargs):
+    # Fixtures of the criterion tables (e.g. from `dumpdata`) are loaded after the rows have already been written
+    # from the filter strings, possibly with other pks
+    if raw:
+        sender.objects.filter(
+            filter_id=instance.filter_id, value_id=instance.value_id
+        ).exclude(pk=instance.pk).delete()
+
+
+for criterion_model in FILTER_CRITERION_MODELS.values():
+    pre_save.connect(_remove_loaded_filter_criterion, sender=criterion_model)
+
+
 class NotificationProfile(models.Model):
     user = models.ForeignKey(
         to=User, on_delete=models.CASCADE, related_name="notification_profiles",
@@ -201,7 +363,7 @@ class NotificationProfile(models.Model):
         for filter_ in self.filters.all():
             alert_query |= filter_.get_alert_query()
 
-        return Alert.prefetch_related_fields(Alert.objects.filter(alert_query))
+        return Alert.load_related_fields(Alert.objects.filter(alert_query))
 
     def alert_fits(self, alert: Alert):
         if not self.active:
@@ -212,3 +374,54 @@ class NotificationProfile(models.Model):
 
     def __str__(self):
         return f"{self.time_slot}: {', '.join(str(f) for f in self.filters.all())}"
+
+
+class NotificationJob(models.Model):
+    """
+    A queued unit of work for sending notifications about an alert, processed by the notification workers.
+    A job without a user is about matching the alert against the notification profiles,
+    which creates one job per notification to send.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["failed", "next_attempt"],
+                name="notificationjob_due_idx",
+            ),
+        ]
+        ordering = ["next_attempt"]
+
+    alert = models.ForeignKey(
+        to=Alert, on_delete=models.CASCADE, related_name="notification_jobs",
+    )
+    user = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="notification_jobs",
+    )
+    medium = models.CharField(
+        max_length=2, choices=NotificationProfile.MEDIA_CHOICES, blank=True
+    )
+
+    created = models.DateTimeField(auto_now_add=True)
+    next_attempt = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the job is due; pushed forward while a worker is processing it.",
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    failed = models.BooleanField(
+        default=False, help_text="Whether the job has been given up on."
+    )
+
+    @property
+    def is_matching_job(self):
+        return self.user_id is None
+
+    def __str__(self):
+        if self.is_matching_job:
+            return f"Match {self.alert}"
+        return f"Send {self.get_medium_display()} to {self.user}: {self.alert}"
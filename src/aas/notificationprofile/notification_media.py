@@ -1,52 +1,275 @@
-import json
 import logging
+import smtplib
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Dict, List, Tuple
 
 from django.conf import settings
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.signals import setting_changed
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
 from django.template.loader import render_to_string
-from rest_framework.renderers import JSONRenderer
 
 from aas.alert.models import Alert
-from aas.alert.serializers import AlertSerializer
+from aas.alert.serializers import AlertSerializer, FastAlertSerializer
+from aas.alert.utils import LRUCache
 from aas.auth.models import User
 from .models import NotificationProfile
 
 
+class MailConnectionPool:
+    """
+    Keeps an open connection to the mail backend per thread (i.e. per notification worker),
+    which is reused for all the emails that are sent, instead of opening a new connection
+    (e.g. an SMTP session with TLS) per email.
+    The connection is reopened after failing to send, and after having been idle for longer than
+    `NOTIFICATION_EMAIL_CONNECTION_MAX_IDLE` seconds, as the server has probably closed it by then.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def send_messages(self, messages: List[EmailMessage]) -> Dict[int, Exception]:
+        """
+        Sends the messages through the pooled connection, in one call to the mail backend,
+        and returns the error of each message that could not be sent, by its index.
+        If the connection turns out to have been closed by the server, it's reopened,
+        and the rest of the messages are retried once; after any other error, the failing message is skipped,
+        and the rest are sent through a new connection, so that no message is sent twice.
+        """
+        errors = {}
+        start = 0
+        retried = False
+        while start < len(messages):
+            try:
+                connection, reused = self._get_connection()
+            except Exception as e:
+                errors.update(dict.fromkeys(range(start, len(messages)), e))
+                break
+
+            # The backend sends the messages in the order they're iterated,
+            # so the message that failed is the last one that was yielded
+            current_index = start
+
+            def iter_messages():
+                nonlocal current_index
+                for current_index in range(start, len(messages)):
+                    yield messages[current_index]
+
+            try:
+                connection.send_messages(iter_messages())
+                start = len(messages)
+            except Exception as e:
+                self.close()
+                if (
+                    not retried
+                    and (reused or current_index > start)
+                    and self._is_connection_error(e)
+                ):
+                    # The server has probably closed the connection before it reached the max idle time
+                    retried = True
+                    start = current_index
+                else:
+                    errors[current_index] = e
+                    start = current_index + 1
+            else:
+                self._local.last_used = time.monotonic()
+        return errors
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                # The connection is probably already closed
+                pass
+
+    def _get_connection(self) -> Tuple[BaseEmailBackend, bool]:
+        connection = getattr(self._local, "connection", None)
+        max_idle = getattr(settings, "NOTIFICATION_EMAIL_CONNECTION_MAX_IDLE", 60)
+        if (
+            connection is not None
+            and time.monotonic() - self._local.last_used > max_idle
+        ):
+            self.close()
+            connection = None
+
+        if connection is not None:
+            return connection, True
+        connection = get_connection()
+        connection.open()
+        self._local.connection = connection
+        self._local.last_used = time.monotonic()
+        return connection, False
+
+    @staticmethod
+    def _is_connection_error(error: Exception):
+        if isinstance(
+            error, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+        ):
+            # The server responded, so the connection was still open
+            return False
+        return isinstance(error, (smtplib.SMTPServerDisconnected, OSError))
+
+
+mail_connection_pool = MailConnectionPool()
+
+
+@receiver(setting_changed)
+def _close_mail_connection(sender, setting, **kwargs):
+    # The connection might have been opened to a different mail backend or server
+    if setting.startswith("EMAIL_"):
+        mail_connection_pool.close()
+
+
 class NotificationMedium(ABC):
     @staticmethod
     @abstractmethod
     def send(alert: Alert, user: User):
         pass
 
+    @classmethod
+    def send_digest(cls, alerts: List[Alert], user: User):
+        """
+        Sends one notification about several alerts; sends one notification per alert unless overridden.
+        """
+        for alert in alerts:
+            cls.send(alert, user)
+
+    @classmethod
+    def send_batch(
+        cls, notifications: List[Tuple[List[Alert], User]]
+    ) -> Dict[int, Exception]:
+        """
+        Sends a notification about each list of alerts to its user (as a digest if there are several alerts),
+        and returns the error of each notification that could not be sent, by its index.
+        Sends them one by one unless overridden.
+        """
+        errors = {}
+        for i, (alerts, user) in enumerate(notifications):
+            try:
+                if len(alerts) == 1:
+                    cls.send(alerts[0], user)
+                else:
+                    cls.send_digest(alerts, user)
+            except Exception as e:
+                errors[i] = e
+        return errors
+
 
 class EmailNotification(NotificationMedium):
+    # The rendered emails by the alerts they're about, as they're equal for all the recipients.
+    # Created on first use, as the settings might not have been configured when this module is imported
+    _rendered_emails = None
+
     @staticmethod
     def send(alert, user):
+        EmailNotification._send_email(
+            user, EmailNotification.get_rendered_email([alert])
+        )
+
+    @classmethod
+    def send_digest(cls, alerts, user):
+        cls._send_email(user, cls.get_rendered_email(alerts))
+
+    @classmethod
+    def send_batch(cls, notifications):
+        # Sent through the pooled connection in one batch
+        return mail_connection_pool.send_messages(
+            [
+                cls._get_message(user, cls.get_rendered_email(alerts))
+                for alerts, user in notifications
+            ]
+        )
+
+    @classmethod
+    def get_rendered_email(cls, alerts: List[Alert]) -> Tuple[str, str, str]:
+        """
+        Returns the subject, plain text body and HTML body of the email about the alerts,
+        rendered only once while it's in the cache of rendered emails.
+        """
+        if cls._rendered_emails is None:
+            cls._rendered_emails = LRUCache(
+                getattr(settings, "NOTIFICATION_EMAIL_RENDER_CACHE_SIZE", 100)
+            )
+        rows = [FastAlertSerializer.get_row_of_alert(alert) for alert in alerts]
+        # Includes every field of the alerts and their related objects that the email is rendered from,
+        # so that changes to any of them (also made by other processes) are rendered
+        cache_key = tuple((row, str(alert)) for row, alert in zip(rows, alerts))
+        rendered_email = cls._rendered_emails.get(cache_key)
+        if rendered_email is None:
+            rendered_email = cls._render_email(alerts, rows)
+            cls._rendered_emails.put(cache_key, rendered_email)
+        return rendered_email
+
+    @classmethod
+    def _render_email(cls, alerts: List[Alert], rows: List[tuple]):
+        serializer = FastAlertSerializer(context={AlertSerializer.NO_PKS_KEY: True})
+        alert_dicts = [serializer.to_representation(row) for row in rows]
+        longest_field_name_length = max(
+            len(max(alert_dict, key=len)) for alert_dict in alert_dicts
+        )
+
+        if len(alerts) == 1:
+            title = f"Alert at {alerts[0]}"
+            template_name = "email"
+            template_context = {
+                "title": title,
+                "alert_dict": alert_dicts[0],
+                "longest_field_name_length": longest_field_name_length,
+            }
+        else:
+            title = f"{len(alerts)} alerts"
+            template_name = "email_digest"
+            template_context = {
+                "title": title,
+                "alerts": [
+                    {"title": f"Alert at {alert}", "alert_dict": alert_dict}
+                    for alert, alert_dict in zip(alerts, alert_dicts)
+                ],
+                "longest_field_name_length": longest_field_name_length,
+            }
+        return (
+            f"{settings.NOTIFICATION_SUBJECT_PREFIX}{title}",
+            render_to_string(
+                f"notificationprofile/{template_name}.txt", template_context
+            ),
+            render_to_string(
+                f"notificationprofile/{template_name}.html", template_context
+            ),
+        )
+
+    @classmethod
+    def _send_email(cls, user: User, rendered_email: Tuple[str, str, str]):
+        errors = mail_connection_pool.send_messages(
+            [cls._get_message(user, rendered_email)]
+        )
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def _get_message(user: User, rendered_email: Tuple[str, str, str]) -> EmailMessage:
         if not user.email:
             logging.getLogger("django.request").warning(
                 f"Cannot send email notification to user '{user}', as they have not set an email address."
             )
 
-        title = f"Alert at {alert}"
-        alert_dict = AlertSerializer(
-            alert, context={AlertSerializer.NO_PKS_KEY: True}
-        ).data
-        # Convert OrderedDicts to dicts
-        alert_dict = json.loads(JSONRenderer().render(alert_dict))
-
-        template_context = {
-            "title": title,
-            "alert_dict": alert_dict,
-            "longest_field_name_length": len(max(alert_dict, key=len)),
-        }
-        user.email_user(
-            subject=f"{settings.NOTIFICATION_SUBJECT_PREFIX}{title}",
-            message=render_to_string("notificationprofile/email.txt", template_context),
-            html_message=render_to_string(
-                "notificationprofile/email.html", template_context
-            ),
-        )
+        subject, body, html_body = rendered_email
+        message = EmailMultiAlternatives(subject=subject, body=body, to=[user.email])
+        message.attach_alternative(html_body, "text/html")
+        return message
+
+
+@receiver(post_migrate)
+def _clear_rendered_emails(sender, **kwargs):
+    # The database might have been flushed, after which the pks of the cached alerts might be reused
+    if EmailNotification._rendered_emails is not None:
+        EmailNotification._rendered_emails.clear()
 
 
 MODEL_REPRESENTATION_TO_CLASS = {
@@ -56,20 +279,6 @@ MODEL_REPRESENTATION_TO_CLASS = {
 }
 
 
-def send_notifications_to_users(alert: Alert):
-    # TODO: only send one notification per medium per user
-    for profile in NotificationProfile.objects.select_related("user"):
-        if profile.alert_fits(alert):
-            send_notification(profile.user, profile, alert)
-
-
-def send_notification(user: User, profile: NotificationProfile, alert: Alert):
-    media = get_notification_media(list(profile.media))
-    for medium in media:
-        if medium is not None:
-            medium.send(alert, user)
-
-
 def get_notification_media(model_representations: List[str]):
     return (
         MODEL_REPRESENTATION_TO_CLASS[representation]
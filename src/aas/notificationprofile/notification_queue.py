@@ -0,0 +1,267 @@
+import logging
+import time
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from aas.alert.models import Alert
+from .matchers import get_matching_profiles_in_sql, profile_index
+from .models import NotificationJob
+from .notification_media import get_notification_media, mail_connection_pool
+
+LOG = logging.getLogger(__name__)
+
+
+def enqueue_notifications(alerts: Iterable[Alert]):
+    NotificationJob.objects.bulk_create(
+        NotificationJob(alert=alert) for alert in alerts
+    )
+
+
+def claim_jobs(max_jobs: int) -> List[NotificationJob]:
+    now = timezone.now()
+    lease_end = now + timedelta(
+        seconds=getattr(settings, "NOTIFICATION_QUEUE_LEASE_TIME", 300)
+    )
+    due_jobs = NotificationJob.objects.filter(failed=False, next_attempt__lte=now)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            claimed_pks = list(
+                due_jobs.select_for_update(skip_locked=True).values_list(
+                    "pk", flat=True
+                )[:max_jobs]
+            )
+            NotificationJob.objects.filter(pk__in=claimed_pks).update(
+                next_attempt=lease_end, attempts=F("attempts") + 1
+            )
+    else:
+        # Claim the jobs one by one, only succeeding if no other worker has claimed the job in the meantime
+        claimed_pks = [
+            pk
+            for pk, next_attempt in due_jobs.values_list("pk", "next_attempt")[
+                :max_jobs
+            ]
+            if NotificationJob.objects.filter(pk=pk, next_attempt=next_attempt).update(
+                next_attempt=lease_end, attempts=F("attempts") + 1
+            )
+        ]
+
+    return list(
+        NotificationJob.objects.filter(pk__in=claimed_pks).select_related(
+            "alert__source",
+            "alert__object__type",
+            "alert__parent_object",
+            "alert__problem_type",
+            "user",
+        )
+    )
+
+
+def process_jobs(jobs: List[NotificationJob]):
+    # The sending jobs are grouped per user and medium, so that each user gets one notification per medium
+    # about all the claimed alerts, instead of one per alert
+    sending_jobs_per_recipient = {}
+    matching_profiles_per_alert_pk = _match_alerts_in_bulk(
+        [job.alert_id for job in jobs if job.is_matching_job]
+    )
+    for job in jobs:
+        if job.is_matching_job:
+            try:
+                _process_matching_job(job, matching_profiles_per_alert_pk)
+            except Exception as e:
+                LOG.exception(f"Failed processing notification job {job.pk}")
+                _schedule_retry(job, e)
+        else:
+            sending_jobs_per_recipient.setdefault((job.user_id, job.medium), []).append(
+                job
+            )
+
+    # The notifications through each medium are sent in one batch, e.g. through one connection to the mail server
+    sending_job_groups_per_medium = {}
+    for (_user_pk, medium), sending_jobs in sending_jobs_per_recipient.items():
+        sending_job_groups_per_medium.setdefault(medium, []).append(sending_jobs)
+    for medium, sending_job_groups in sending_job_groups_per_medium.items():
+        try:
+            errors = _process_sending_jobs(medium, sending_job_groups)
+        except Exception as e:
+            errors = dict.fromkeys(range(len(sending_job_groups)), e)
+        for i, error in errors.items():
+            sending_jobs = sending_job_groups[i]
+            LOG.error(
+                f"Failed processing notification jobs {[job.pk for job in sending_jobs]}",
+                exc_info=error,
+            )
+            for job in sending_jobs:
+                _schedule_retry(job, error)
+
+
+def _match_alerts_in_bulk(alert_pks: List[int]) -> Optional[dict]:
+    """
+    Returns the notification profiles that each of the alerts matches, as found by the database,
+    if there are enough alerts for that to be faster than matching them one by one through the profile index.
+    Both find the same profiles as long as the criterion tables of the filters are in sync with their filter strings.
+    """
+    min_alerts = getattr(settings, "NOTIFICATION_SQL_MATCHING_MIN_ALERTS", 50)
+    if not alert_pks or len(alert_pks) < min_alerts:
+        return None
+    try:
+        return get_matching_profiles_in_sql(alert_pks)
+    except Exception:
+        LOG.exception("Failed matching alerts in bulk; matching them one by one")
+        return None
+
+
+def _process_matching_job(
+    job: NotificationJob, matching_profiles_per_alert_pk: Optional[dict] = None
+):
+    if matching_profiles_per_alert_pk is not None:
+        profiles = matching_profiles_per_alert_pk[job.alert_id]
+    else:
+        profiles = profile_index.get_matching_profiles(job.alert)
+    # Only one notification per medium is sent to each user, even if several of their profiles match the alert
+    recipients = {
+        (profile.user_id, medium)
+        for profile in profiles
+        for medium, medium_class in zip(
+            profile.media, get_notification_media(profile.media)
+        )
+        if medium_class is not None
+    }
+    due_times = _get_digest_due_times(recipients)
+    sending_jobs = [
+        NotificationJob(
+            alert=job.alert,
+            user_id=user_pk,
+            medium=medium,
+            next_attempt=due_times[user_pk, medium],
+        )
+        for user_pk, medium in sorted(recipients)
+    ]
+    with transaction.atomic():
+        NotificationJob.objects.bulk_create(sending_jobs)
+        job.delete()
+
+
+def _get_digest_due_times(recipients: set) -> dict:
+    """
+    Returns when the notifications to each `(user_pk, medium)` should be sent.
+    With a digest window, a notification waits for the duration of the window,
+    and a notification to a recipient that is already waiting for one joins it,
+    so that their alerts are sent in one digest.
+    """
+    now = timezone.now()
+    digest_window = getattr(settings, "NOTIFICATION_DIGEST_WINDOW", 0)
+    if digest_window <= 0 or not recipients:
+        return {recipient: now for recipient in recipients}
+
+    due_times = {
+        recipient: now + timedelta(seconds=digest_window) for recipient in recipients
+    }
+    # Jobs that have been attempted are being sent or retried, and are not waiting for a digest
+    waiting_jobs = NotificationJob.objects.filter(
+        user__in={user_pk for user_pk, _medium in recipients},
+        failed=False,
+        attempts=0,
+        next_attempt__gt=now,
+    )
+    for user_pk, medium, next_attempt in waiting_jobs.values_list(
+        "user", "medium", "next_attempt"
+    ):
+        recipient = (user_pk, medium)
+        if recipient in due_times:
+            due_times[recipient] = min(due_times[recipient], next_attempt)
+    return due_times
+
+
+def _process_sending_jobs(
+    medium: str, job_groups: List[List[NotificationJob]]
+) -> Dict[int, Exception]:
+    """
+    Sends one notification through the medium per group of jobs (i.e. per user), about all the alerts of the group,
+    and returns the error of each group whose notification could not be sent, by its index.
+    """
+    (medium_class,) = get_notification_media([medium])
+    notifications = [
+        (
+            sorted(
+                {job.alert_id: job.alert for job in jobs}.values(),
+                key=lambda alert: (alert.timestamp, alert.pk),
+            ),
+            jobs[0].user,
+        )
+        for jobs in job_groups
+    ]
+    errors = medium_class.send_batch(notifications)
+    NotificationJob.objects.filter(
+        pk__in=[
+            job.pk
+            for i, jobs in enumerate(job_groups)
+            if i not in errors
+            for job in jobs
+        ]
+    ).delete()
+    return errors
+
+
+def _schedule_retry(job: NotificationJob, error: Exception):
+    job.last_error = repr(error)
+    if job.attempts >= getattr(settings, "NOTIFICATION_QUEUE_MAX_ATTEMPTS", 5):
+        job.failed = True
+    else:
+        # Exponential backoff
+        retry_delay = min(
+            getattr(settings, "NOTIFICATION_QUEUE_RETRY_DELAY", 30)
+            * 2 ** (job.attempts - 1),
+            getattr(settings, "NOTIFICATION_QUEUE_MAX_RETRY_DELAY", 3600),
+        )
+        job.next_attempt = timezone.now() + timedelta(seconds=retry_delay)
+    job.save(update_fields=["last_error", "failed", "next_attempt"])
+
+
+def get_queue_stats():
+    now = timezone.now()
+    not_failed = Q(failed=False)
+    # The aliases must not be equal to any field names, as they would be confused in the filters
+    stats = NotificationJob.objects.aggregate(
+        num_due=Count("pk", filter=not_failed & Q(next_attempt__lte=now)),
+        # Jobs that are being processed, or that are waiting to be retried
+        num_scheduled=Count("pk", filter=not_failed & Q(next_attempt__gt=now)),
+        num_failed=Count("pk", filter=Q(failed=True)),
+        oldest_due_created=Min("created", filter=not_failed & Q(next_attempt__lte=now)),
+    )
+    oldest_due_created = stats["oldest_due_created"]
+    return {
+        "due": stats["num_due"],
+        "scheduled": stats["num_scheduled"],
+        "failed": stats["num_failed"],
+        "oldest_due_age": (
+            (now - oldest_due_created).total_seconds()
+            if oldest_due_created is not None
+            else None
+        ),
+    }
+
+
+def run_worker(batch_size: int, poll_interval: float, stop_when_empty=False):
+    stats_interval = getattr(settings, "NOTIFICATION_QUEUE_STATS_LOG_INTERVAL", 60)
+    last_stats_logged = time.monotonic()
+    try:
+        while True:
+            jobs = claim_jobs(batch_size)
+            if jobs:
+                process_jobs(jobs)
+            elif stop_when_empty:
+                return
+            else:
+                time.sleep(poll_interval)
+
+            if time.monotonic() - last_stats_logged > stats_interval:
+                LOG.info(f"Notification queue: {get_queue_stats()}")
+                last_stats_logged = time.monotonic()
+    finally:
+        mail_connection_pool.close()
@@ -1,6 +1,17 @@
-from datetime import datetime, time
+import json
+import socket
+import tempfile
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import skipIf
+from unittest.mock import patch
 
-from django.test import TransactionTestCase
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test import TransactionTestCase, override_settings
 from django.utils import timezone
 from django.utils.timezone import make_aware
 from rest_framework.authtoken.models import Token
@@ -10,12 +21,37 @@ from rest_framework.test import APITransactionTestCase
 from aas.alert.models import Alert, NetworkSystem, Object, ObjectType, ProblemType
 from aas.alert.serializers import AlertSerializer
 from aas.auth.models import User
+from aas.notificationprofile.matchers import (
+    INDEX_VERSION_CACHE_KEY,
+    get_matching_profiles_in_sql,
+    profile_index,
+)
 from aas.notificationprofile.models import (
     Filter,
+    FilterProblemType,
+    FilterSource,
+    NotificationJob,
     NotificationProfile,
     TimeInterval,
     TimeSlot,
 )
+from aas.notificationprofile.notification_media import (
+    EmailNotification,
+    mail_connection_pool,
+)
+from aas.notificationprofile.notification_queue import (
+    claim_jobs,
+    enqueue_notifications,
+    get_queue_stats,
+    process_jobs,
+    run_worker,
+)
+from aas.notificationprofile.utils import WeeklySchedule
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
 
 
 class MockAlertData:
@@ -142,6 +178,50 @@ class TestModels(TransactionTestCase, MockAlertData):
             )
         )
 
+    def test_weekly_schedule(self):
+        schedule = WeeklySchedule(
+            [
+                (1, time.fromisoformat("00:30:00"), time.fromisoformat("00:30:01")),
+                (1, time.fromisoformat("00:30:03"), time.fromisoformat("00:31")),
+                # Overlaps the interval above, and should be merged with it
+                (1, time.fromisoformat("00:30:30"), time.fromisoformat("01:00")),
+                (7, TimeInterval.DAY_START, TimeInterval.DAY_END),
+            ]
+        )
+        self.assertEqual(len(schedule.starts), 3)
+
+        def contains(timestamp: datetime, new_time: str):
+            return schedule.contains_local_timestamp(
+                self.replace_time(timestamp, new_time)
+            )
+
+        self.assertFalse(contains(self.monday_time, "00:29:59.999999"))
+        self.assertTrue(contains(self.monday_time, "00:30:00"))
+        self.assertTrue(contains(self.monday_time, "00:30:01"))
+        self.assertFalse(contains(self.monday_time, "00:30:02"))
+        self.assertTrue(contains(self.monday_time, "00:45"))
+        self.assertTrue(contains(self.monday_time, "01:00"))
+        self.assertFalse(contains(self.monday_time, "01:00:00.000001"))
+        sunday_time = self.monday_time + timedelta(days=6)
+        self.assertTrue(contains(sunday_time, "00:00"))
+        self.assertTrue(contains(sunday_time, "23:59:59.999999"))
+        self.assertFalse(contains(sunday_time - timedelta(days=1), "23:59:59.999999"))
+
+        # The schedule of a time slot should give the same results as its time intervals
+        for timestamp in (
+            self.replace_time(self.monday_time, "00:30:01"),
+            self.replace_time(self.monday_time, "00:30:02"),
+            self.replace_time(self.monday_time, "12:00"),
+            self.replace_time(self.monday_time + timedelta(days=1), "12:00"),
+        ):
+            self.assertEqual(
+                self.time_slot1.get_schedule().contains_local_timestamp(timestamp),
+                any(
+                    interval.timestamp_is_within(timestamp)
+                    for interval in self.time_slot1.time_intervals.all()
+                ),
+            )
+
     def test_filter(self):
         filter1 = Filter.objects.create(
             user=self.user,
@@ -167,6 +247,629 @@ class TestModels(TransactionTestCase, MockAlertData):
         self.assertEqual(set(filter1.filtered_alerts), {self.alert1})
         self.assertEqual(set(filter2.filtered_alerts), {self.alert2})
 
+    def test_filters_fitting_alert_are_looked_up_through_criteria(self):
+        def get_filter_string(source_pks=(), problem_type_pks=()):
+            return json.dumps(
+                {
+                    "sourceIds": list(source_pks),
+                    "objectTypeIds": [],
+                    "parentObjectIds": [],
+                    "problemTypeIds": list(problem_type_pks),
+                }
+            )
+
+        unrestricted_filter = Filter.objects.create(
+            user=self.user, name="Filter1", filter_string=get_filter_string()
+        )
+        nav_filter = Filter.objects.create(
+            user=self.user,
+            name="Filter2",
+            filter_string=get_filter_string(source_pks=[self.nav1.pk]),
+        )
+        problem_type_filter = Filter.objects.create(
+            user=self.user,
+            name="Filter3",
+            filter_string=get_filter_string(
+                source_pks=[self.nav1.pk, self.zabbix1.pk],
+                problem_type_pks=[self.problem_type1.pk],
+            ),
+        )
+        # Refers to a problem type that does not exist (anymore)
+        missing_problem_type_filter = Filter.objects.create(
+            user=self.user,
+            name="Filter4",
+            filter_string=get_filter_string(problem_type_pks=[1000]),
+        )
+
+        self.assertEqual(
+            set(
+                FilterProblemType.objects.filter(value=self.problem_type1).values_list(
+                    "filter", flat=True
+                )
+            ),
+            {problem_type_filter.pk},
+        )
+        for alert in (self.alert1, self.alert2):
+            self.assertEqual(
+                set(Filter.get_filters_fitting_alert(alert)),
+                {
+                    filter_
+                    for filter_ in Filter.objects.all()
+                    if filter_.alert_fits(alert)
+                },
+            )
+        self.assertEqual(
+            set(Filter.get_filters_fitting_alert(self.alert1)),
+            {unrestricted_filter, nav_filter, problem_type_filter},
+        )
+
+        # Saving the filter string should replace the criteria
+        nav_filter.filter_string = get_filter_string(source_pks=[self.zabbix1.pk])
+        nav_filter.save()
+        self.assertFalse(nav_filter.alert_fits(self.alert1))
+        self.assertNotIn(nav_filter, Filter.get_filters_fitting_alert(self.alert1))
+        self.assertIn(nav_filter, Filter.get_filters_fitting_alert(self.alert2))
+
+        missing_problem_type_filter.delete()
+        self.assertFalse(FilterProblemType.objects.filter(value_id=1000).exists())
+
+    def test_notification_profile_index(self):
+        def get_filter_string(source: NetworkSystem):
+            return (
+                "{"
+                f'"sourceIds":[{source.pk}], "objectTypeIds":[], "parentObjectIds":[], "problemTypeIds":[]'
+                "}"
+            )
+
+        def get_matching_profiles(alert: Alert):
+            return {
+                profile.pk for profile in profile_index.get_matching_profiles(alert)
+            }
+
+        def get_fitting_profiles(alert: Alert):
+            return {
+                profile.pk
+                for profile in NotificationProfile.objects.all()
+                if profile.alert_fits(alert)
+            }
+
+        filter1 = Filter.objects.create(
+            user=self.user,
+            name="Filter1",
+            filter_string=get_filter_string(self.nav1),
+        )
+        filter2 = Filter.objects.create(
+            user=self.user,
+            name="Filter2",
+            filter_string=get_filter_string(self.zabbix1),
+        )
+        time_slot_immediately = self.user.time_slots.get(name="Immediately")
+        profile1 = NotificationProfile.objects.create(
+            user=self.user, time_slot=time_slot_immediately
+        )
+        profile1.filters.add(filter1)
+        profile2 = NotificationProfile.objects.create(
+            user=self.user, time_slot=self.time_slot1
+        )
+        profile2.filters.add(filter1, filter2)
+
+        for alert in (self.alert1, self.alert2):
+            self.assertEqual(get_matching_profiles(alert), get_fitting_profiles(alert))
+        self.assertIn(profile1.pk, get_matching_profiles(self.alert1))
+        self.assertNotIn(profile1.pk, get_matching_profiles(self.alert2))
+
+        # Changes should be reflected in the index
+        filter1.filter_string = get_filter_string(self.zabbix1)
+        filter1.save()
+        self.assertNotIn(profile1.pk, get_matching_profiles(self.alert1))
+        self.assertIn(profile1.pk, get_matching_profiles(self.alert2))
+
+        profile1.active = False
+        profile1.save()
+        self.assertNotIn(profile1.pk, get_matching_profiles(self.alert2))
+
+        profile1.active = True
+        profile1.save()
+        time_slot_immediately.time_intervals.all().delete()
+        self.assertNotIn(profile1.pk, get_matching_profiles(self.alert2))
+
+        profile2.filters.remove(filter2)
+        filter1.delete()
+        for alert in (self.alert1, self.alert2):
+            self.assertEqual(get_matching_profiles(alert), set())
+
+    def test_notification_profile_index_is_marked_changed_on_commit(self):
+        filter_ = Filter.objects.create(
+            user=self.user,
+            name="Filter",
+            filter_string="{"
+            f'"sourceIds":[{self.nav1.pk}], "objectTypeIds":[], "parentObjectIds":[], "problemTypeIds":[]'
+            "}",
+        )
+        version = cache.get(INDEX_VERSION_CACHE_KEY)
+        with transaction.atomic():
+            filter_.save()
+            version_before_commit = cache.get(INDEX_VERSION_CACHE_KEY)
+            self.assertGreater(version_before_commit, version)
+        # Processes that refreshed the index from the uncommitted change should rebuild it again
+        self.assertGreater(cache.get(INDEX_VERSION_CACHE_KEY), version_before_commit)
+
+    def test_matching_profiles_in_sql(self):
+        def get_filter_string(source_pks=(), problem_type_pks=()):
+            return json.dumps(
+                {
+                    "sourceIds": list(source_pks),
+                    "objectTypeIds": [],
+                    "parentObjectIds": [],
+                    "problemTypeIds": list(problem_type_pks),
+                }
+            )
+
+        nav_filter = Filter.objects.create(
+            user=self.user,
+            name="Filter1",
+            filter_string=get_filter_string(source_pks=[self.nav1.pk]),
+        )
+        problem_type_filter = Filter.objects.create(
+            user=self.user,
+            name="Filter2",
+            filter_string=get_filter_string(problem_type_pks=[self.problem_type1.pk]),
+        )
+        missing_problem_type_filter = Filter.objects.create(
+            user=self.user,
+            name="Filter3",
+            filter_string=get_filter_string(problem_type_pks=[1000]),
+        )
+        profile1 = NotificationProfile.objects.create(
+            user=self.user, time_slot=self.user.time_slots.get(name="Immediately")
+        )
+        profile1.filters.add(nav_filter, missing_problem_type_filter)
+        profile2 = NotificationProfile.objects.create(
+            user=self.user, time_slot=self.time_slot1, media=["EM", "SM"]
+        )
+        profile2.filters.add(problem_type_filter)
+        inactive_profile = NotificationProfile.objects.create(
+            user=self.user,
+            time_slot=TimeSlot.objects.create(user=self.user, name="Inactive"),
+            active=False,
+        )
+        inactive_profile.filters.add(problem_type_filter)
+
+        alerts = [self.alert1, self.alert2]
+        for timestamp in (
+            self.replace_time(self.monday_time, "00:30:00.5"),
+            self.replace_time(self.monday_time, "00:30:02"),
+            self.replace_time(self.monday_time + timedelta(days=1), "12:00"),
+        ):
+            for alert in (self.alert1, self.alert2):
+                alert = Alert.objects.get(pk=alert.pk)
+                alert.pk = None
+                alert.alert_id = str(len(alerts))
+                alert.timestamp = timestamp
+                alert.save()
+                alerts.append(alert)
+
+        profiles_per_alert_pk = get_matching_profiles_in_sql(
+            alert.pk for alert in alerts
+        )
+        self.assertEqual(set(profiles_per_alert_pk), {alert.pk for alert in alerts})
+        for alert in alerts:
+            self.assertEqual(
+                {profile.pk for profile in profiles_per_alert_pk[alert.pk]},
+                {
+                    profile.pk
+                    for profile in NotificationProfile.objects.all()
+                    if profile.alert_fits(alert)
+                },
+            )
+        self.assertIn(
+            (profile2.pk, self.user.pk, ["EM", "SM"]),
+            profiles_per_alert_pk[alerts[-1].pk],
+        )
+        self.assertEqual(profiles_per_alert_pk[alerts[-3].pk], [])
+
+    def test_filter_criteria_are_written_when_loading_and_rebuilding_filters(self):
+        def get_filter_string(source: NetworkSystem):
+            return json.dumps(
+                {
+                    "sourceIds": [source.pk],
+                    "objectTypeIds": [],
+                    "parentObjectIds": [],
+                    "problemTypeIds": [],
+                }
+            )
+
+        def assert_sql_matches_index():
+            profiles_per_alert_pk = get_matching_profiles_in_sql(
+                [self.alert1.pk, self.alert2.pk]
+            )
+            for alert in (self.alert1, self.alert2):
+                self.assertEqual(
+                    {profile.pk for profile in profiles_per_alert_pk[alert.pk]},
+                    {
+                        profile.pk
+                        for profile in profile_index.get_matching_profiles(alert)
+                    },
+                )
+
+        fixture = [
+            {
+                "model": "aas_notoprofile.filter",
+                "pk": 100,
+                "fields": {
+                    "user": self.user.pk,
+                    "name": "Loaded",
+                    "filter_string": get_filter_string(self.nav1),
+                },
+            },
+            # Dumped criterion rows should not conflict with the rows written from the filter string
+            {
+                "model": "aas_notoprofile.filtersource",
+                "pk": 100,
+                "fields": {"filter": 100, "value": self.nav1.pk},
+            },
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as fixture_file:
+            json.dump(fixture, fixture_file)
+            fixture_file.flush()
+            call_command("loaddata", fixture_file.name, verbosity=0)
+        self.assertEqual(
+            list(FilterSource.objects.values_list("filter", "value")),
+            [(100, self.nav1.pk)],
+        )
+
+        profile = NotificationProfile.objects.create(
+            user=self.user, time_slot=self.user.time_slots.get(name="Immediately")
+        )
+        profile.filters.add(100)
+        assert_sql_matches_index()
+        self.assertIn(
+            profile.pk,
+            {
+                p.pk
+                for p in get_matching_profiles_in_sql([self.alert1.pk])[self.alert1.pk]
+            },
+        )
+
+        # Changed without sending `post_save`
+        Filter.objects.filter(pk=100).update(
+            filter_string=get_filter_string(self.zabbix1)
+        )
+        call_command("rebuildfiltercriteria", stdout=StringIO())
+        assert_sql_matches_index()
+        self.assertIn(
+            profile.pk,
+            {
+                p.pk
+                for p in get_matching_profiles_in_sql([self.alert2.pk])[self.alert2.pk]
+            },
+        )
+
+
+class TestNotificationQueue(TransactionTestCase, MockAlertData):
+    def setUp(self):
+        super().init_mock_data()
+        self.user.email = "asdf@example.com"
+        self.user.save()
+
+        filter1 = Filter.objects.create(
+            user=self.user,
+            name="Filter1",
+            filter_string="{"
+            f'"sourceIds":[{self.nav1.pk}], "objectTypeIds":[], "parentObjectIds":[], "problemTypeIds":[]'
+            "}",
+        )
+        notification_profile1 = NotificationProfile.objects.create(
+            user=self.user, time_slot=self.user.time_slots.get(name="Immediately")
+        )
+        notification_profile1.filters.add(filter1)
+
+    def test_send_queued_notifications(self):
+        enqueue_notifications([self.alert1, self.alert2])
+        self.assertEqual(get_queue_stats()["due"], 2)
+
+        run_worker(batch_size=10, poll_interval=0, stop_when_empty=True)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
+        self.assertFalse(NotificationJob.objects.exists())
+
+    @override_settings(NOTIFICATION_SQL_MATCHING_MIN_ALERTS=1)
+    def test_send_queued_notifications_matched_in_sql(self):
+        self.add_profile_for_all_sources()
+        enqueue_notifications([self.alert1, self.alert2])
+        with patch.object(
+            profile_index, "get_matching_profiles"
+        ) as get_matching_profiles:
+            run_worker(batch_size=10, poll_interval=0, stop_when_empty=True)
+        get_matching_profiles.assert_not_called()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("2 alerts", mail.outbox[0].subject)
+        self.assertFalse(NotificationJob.objects.exists())
+
+    def test_alerts_matched_in_sql_and_through_index_get_the_same_recipients(self):
+        self.add_profile_for_all_sources()
+        user2 = User.objects.create(username="qwer", email="qwer@example.com")
+        problem_type_filter = Filter.objects.create(
+            user=user2,
+            name="Filter",
+            filter_string="{"
+            f'"sourceIds":[], "objectTypeIds":[], "parentObjectIds":[], "problemTypeIds":[{self.problem_type1.pk}]'
+            "}",
+        )
+        profile = NotificationProfile.objects.create(
+            user=user2,
+            time_slot=user2.time_slots.get(name="Immediately"),
+            media=["EM", "SM"],
+        )
+        profile.filters.add(problem_type_filter)
+        inactive_profile = NotificationProfile.objects.create(
+            user=user2,
+            time_slot=TimeSlot.objects.create(user=user2, name="Inactive"),
+            active=False,
+        )
+        inactive_profile.filters.add(problem_type_filter)
+
+        def get_recipients_per_alert(min_sql_matching_alerts: int):
+            NotificationJob.objects.all().delete()
+            enqueue_notifications([self.alert1, self.alert2])
+            with override_settings(
+                NOTIFICATION_SQL_MATCHING_MIN_ALERTS=min_sql_matching_alerts
+            ), patch.object(
+                profile_index,
+                "get_matching_profiles",
+                wraps=profile_index.get_matching_profiles,
+            ) as get_matching_profiles:
+                process_jobs(claim_jobs(10))
+            recipients = NotificationJob.objects.values_list("alert", "user", "medium")
+            return set(recipients), get_matching_profiles.called
+
+        recipients_per_alert, matched_through_index = get_recipients_per_alert(1000)
+        self.assertTrue(matched_through_index)
+        self.assertIn((self.alert2.pk, user2.pk, "EM"), recipients_per_alert)
+        self.assertEqual(get_recipients_per_alert(1), (recipients_per_alert, False))
+
+    def add_profile_for_all_sources(self):
+        filter2 = Filter.objects.create(
+            user=self.user,
+            name="Filter2",
+            filter_string="{"
+            f'"sourceIds":[{self.nav1.pk}, {self.zabbix1.pk}], "objectTypeIds":[], "parentObjectIds":[], "problemTypeIds":[]'
+            "}",
+        )
+        time_slot2 = TimeSlot.objects.create(user=self.user, name="Always")
+        for day, _day_name in TimeInterval.DAY_CHOICES:
+            TimeInterval.objects.create(
+                time_slot=time_slot2,
+                day=day,
+                start=TimeInterval.DAY_START,
+                end=TimeInterval.DAY_END,
+            )
+        notification_profile2 = NotificationProfile.objects.create(
+            user=self.user, time_slot=time_slot2
+        )
+        notification_profile2.filters.add(filter2)
+
+    def test_notifications_are_grouped_per_user_and_medium(self):
+        # Both profiles match `alert1`, which should still only be sent once
+        self.add_profile_for_all_sources()
+        enqueue_notifications([self.alert1, self.alert2])
+
+        with patch.object(
+            EmailNotification, "send_batch", wraps=EmailNotification.send_batch
+        ) as send_batch:
+            run_worker(batch_size=10, poll_interval=0, stop_when_empty=True)
+        send_batch.assert_called_once()
+        (notifications,), _kwargs = send_batch.call_args
+        self.assertEqual(notifications, [([self.alert1, self.alert2], self.user)])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("2 alerts", mail.outbox[0].subject)
+        self.assertEqual(mail.outbox[0].body.count("Alert at"), 2)
+        self.assertFalse(NotificationJob.objects.exists())
+
+    @override_settings(NOTIFICATION_DIGEST_WINDOW=60)
+    def test_notifications_are_sent_in_digests(self):
+        self.add_profile_for_all_sources()
+        enqueue_notifications([self.alert1])
+        run_worker(batch_size=10, poll_interval=0, stop_when_empty=True)
+        # The notification should wait for the digest window
+        self.assertEqual(len(mail.outbox), 0)
+        job1 = NotificationJob.objects.get()
+        self.assertGreater(job1.next_attempt, timezone.now())
+
+        enqueue_notifications([self.alert2])
+        run_worker(batch_size=10, poll_interval=0, stop_when_empty=True)
+        self.assertEqual(len(mail.outbox), 0)
+        # The later notification should join the waiting one
+        self.assertEqual(
+            set(NotificationJob.objects.values_list("next_attempt", flat=True)),
+            {job1.next_attempt},
+        )
+
+        NotificationJob.objects.update(next_attempt=timezone.now())
+        run_worker(batch_size=10, poll_interval=0, stop_when_empty=True)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("2 alerts", mail.outbox[0].subject)
+
+    def test_failed_notifications_are_retried(self):
+        enqueue_notifications([self.alert1])
+        with patch.object(
+            mail_connection_pool, "send_messages", return_value={0: OSError()}
+        ):
+            run_worker(batch_size=10, poll_interval=0, stop_when_empty=True)
+
+        job = NotificationJob.objects.get()
+        self.assertEqual(job.user, self.user)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("OSError", job.last_error)
+        self.assertFalse(job.failed)
+        self.assertGreater(job.next_attempt, timezone.now())
+        self.assertEqual(get_queue_stats()["scheduled"], 1)
+
+        job.attempts = 4
+        job.next_attempt = timezone.now()
+        job.save()
+        with patch.object(EmailNotification, "send_batch", side_effect=OSError):
+            run_worker(batch_size=10, poll_interval=0, stop_when_empty=True)
+        self.assertTrue(NotificationJob.objects.get().failed)
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class RecordingSMTPHandler:
+    def __init__(self):
+        self.envelopes = []
+        # The address of the client of each connection
+        self.peers = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append(envelope)
+        self.peers.add(session.peer)
+        return "250 Message accepted for delivery"
+
+
+class TestEmailRendering(TransactionTestCase, MockAlertData):
+    def setUp(self):
+        super().init_mock_data()
+        self.user.email = "asdf@example.com"
+        self.user.save()
+        self.user2 = User.objects.create(username="qwer", email="qwer@example.com")
+
+    def test_emails_are_rendered_once_per_alert(self):
+        with patch(
+            "aas.notificationprofile.notification_media.render_to_string",
+            wraps=render_to_string,
+        ) as render:
+            EmailNotification.send(self.alert1, self.user)
+            EmailNotification.send(self.alert1, self.user2)
+            # Once for the plain text body, and once for the HTML body
+            self.assertEqual(render.call_count, 2)
+
+            # Changed alerts should be rendered again
+            self.alert1.ticket_url = "https://tickets.example.org/1"
+            EmailNotification.send(self.alert1, self.user)
+            self.assertEqual(render.call_count, 4)
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].body, mail.outbox[1].body)
+        self.assertEqual(mail.outbox[1].to, [self.user2.email])
+        self.assertIn("https://tickets.example.org/1", mail.outbox[2].body)
+
+    def test_emails_are_rendered_again_after_related_objects_change(self):
+        EmailNotification.send(self.alert1, self.user)
+        problem_type = ProblemType.objects.get(pk=self.alert1.problem_type_id)
+        problem_type.description = "Changed description"
+        problem_type.save()
+
+        # The alert is loaded again, like notification workers do
+        EmailNotification.send(Alert.objects.get(pk=self.alert1.pk), self.user)
+        self.assertNotIn("Changed description", mail.outbox[0].body)
+        self.assertIn("Changed description", mail.outbox[1].body)
+
+    def test_email_contains_alert_fields(self):
+        EmailNotification.send(self.alert1, self.user)
+        alert_dict = json.loads(
+            JSONRenderer().render(
+                AlertSerializer(
+                    self.alert1, context={AlertSerializer.NO_PKS_KEY: True}
+                ).data
+            )
+        )
+        html_body, _mimetype = mail.outbox[0].alternatives[0]
+        for field_name, value in alert_dict.items():
+            self.assertIn(field_name, mail.outbox[0].body)
+            self.assertIn(field_name, html_body)
+        self.assertIn(alert_dict["timestamp"], mail.outbox[0].body)
+
+
+@skipIf(Controller is None, "aiosmtpd is not installed")
+class TestEmailNotification(TransactionTestCase, MockAlertData):
+    def setUp(self):
+        super().init_mock_data()
+        self.user.email = "asdf@example.com"
+        self.user.save()
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.handler = RecordingSMTPHandler()
+        self.start_smtp_server()
+        self.addCleanup(self.stop_smtp_server)
+
+        email_settings = override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=self.port,
+            EMAIL_USE_TLS=False,
+        )
+        email_settings.enable()
+        self.addCleanup(email_settings.disable)
+        self.addCleanup(mail_connection_pool.close)
+
+    def start_smtp_server(self):
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+
+    def stop_smtp_server(self):
+        if self.controller is not None:
+            self.controller.stop()
+            self.controller = None
+
+    def test_emails_are_sent_through_one_connection(self):
+        EmailNotification.send(self.alert1, self.user)
+        EmailNotification.send(self.alert2, self.user)
+        EmailNotification.send_digest([self.alert1, self.alert2], self.user)
+
+        self.assertEqual(len(self.handler.envelopes), 3)
+        self.assertEqual(self.handler.envelopes[0].rcpt_tos, [self.user.email])
+        self.assertEqual(len(self.handler.peers), 1)
+
+    def test_connection_is_reopened_after_failing(self):
+        EmailNotification.send(self.alert1, self.user)
+        self.stop_smtp_server()
+        with self.assertRaises(OSError):
+            EmailNotification.send(self.alert2, self.user)
+
+        self.start_smtp_server()
+        EmailNotification.send(self.alert2, self.user)
+        self.assertEqual(len(self.handler.envelopes), 2)
+        self.assertEqual(len(self.handler.peers), 2)
+
+    def test_emails_are_sent_in_one_batch(self):
+        user2 = User.objects.create(username="qwer", email="qwer@example.com")
+        EmailNotification.send(self.alert1, self.user)
+        # The server closes the connection before it has been idle for long enough to be reopened
+        self.stop_smtp_server()
+        self.start_smtp_server()
+
+        with patch.object(
+            mail_connection_pool,
+            "_get_connection",
+            wraps=mail_connection_pool._get_connection,
+        ) as get_connection:
+            errors = EmailNotification.send_batch(
+                [([self.alert1], self.user), ([self.alert1, self.alert2], user2)]
+            )
+        self.assertEqual(errors, {})
+        # Once for the closed connection, and once for the new connection
+        self.assertEqual(get_connection.call_count, 2)
+        self.assertEqual(
+            [envelope.rcpt_tos for envelope in self.handler.envelopes[1:]],
+            [[self.user.email], [user2.email]],
+        )
+
+        self.stop_smtp_server()
+        errors = EmailNotification.send_batch([([self.alert1], self.user)] * 2)
+        self.assertEqual(set(errors), {0, 1})
+
+    def test_closed_pooled_connection_is_reopened_before_failing(self):
+        EmailNotification.send(self.alert1, self.user)
+        # The server closes the connection before it has been idle for long enough to be reopened
+        self.stop_smtp_server()
+        self.start_smtp_server()
+
+        EmailNotification.send(self.alert2, self.user)
+        self.assertEqual(len(self.handler.envelopes), 2)
+        self.assertEqual(len(self.handler.peers), 2)
+
 
 class TestViews(APITransactionTestCase, MockAlertData):
     def setUp(self):
@@ -198,4 +901,30 @@ class TestViews(APITransactionTestCase, MockAlertData):
         response.render()
         self.assertEqual(response.content, self.alert1_json)
 
+    def test_streamed_alerts_filtered_by_notification_profile_view(self):
+        response = self.client.get(
+            f"/api/v1/notificationprofiles/{self.notification_profile1.pk}/alerts/?stream"
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(b"".join(response.streaming_content), self.alert1_json)
+
+    def test_number_of_queries_of_alert_views(self):
+        # One query for authenticating the token, one for the notification profile,
+        # one for its filters and one for the alerts with their related fields
+        with self.assertNumQueries(4):
+            self.client.get(
+                f"/api/v1/notificationprofiles/{self.notification_profile1.pk}/alerts/"
+            )
+        with self.assertNumQueries(2):
+            self.client.post(
+                "/api/v1/notificationprofiles/filterpreview/",
+                {
+                    "sourceIds": [self.nav1.pk],
+                    "objectTypeIds": [],
+                    "parentObjectIds": [],
+                    "problemTypeIds": [],
+                },
+                format="json",
+            )
+
     # TODO: test more endpoints
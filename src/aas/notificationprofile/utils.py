@@ -1,3 +1,11 @@
+from array import array
+from bisect import bisect_right
+from datetime import datetime, time
+from typing import Iterable, Tuple
+
+MICROSECONDS_PER_DAY = 24 * 60 * 60 * 1_000_000
+
+
 class AttrGetter:
     def __init__(self, attr_name: str):
         self.attr_name = attr_name
@@ -25,3 +33,65 @@ class NestedAttrGetter(AttrGetter):
     @property
     def query(self):
         return self._attr_query
+
+
+def get_time_offset(time_: time) -> int:
+    """
+    Returns the number of microseconds since midnight.
+    """
+    return (
+        (time_.hour * 60 + time_.minute) * 60 + time_.second
+    ) * 1_000_000 + time_.microsecond
+
+
+def get_week_offset(local_timestamp: datetime) -> int:
+    """
+    Returns the number of microseconds since the start of the week (Monday at midnight) of a local timestamp.
+    """
+    return (local_timestamp.isoweekday() - 1) * MICROSECONDS_PER_DAY + get_time_offset(
+        local_timestamp
+    )
+
+
+class WeeklySchedule:
+    """
+    The time intervals of a week, compiled to sorted arrays of the starts and ends of the intervals
+    (merged where they overlap), as offsets from the start of the week,
+    so that finding whether a timestamp is within any of the intervals is a binary search.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[int, time, time]]):
+        """
+        :param intervals: `(isoweekday, start, end)` of each interval, in local time, including both the start and the end.
+        """
+        interval_offsets = sorted(
+            (
+                (isoweekday - 1) * MICROSECONDS_PER_DAY + get_time_offset(start),
+                (isoweekday - 1) * MICROSECONDS_PER_DAY + get_time_offset(end),
+            )
+            for isoweekday, start, end in intervals
+            if start <= end
+        )
+        merged_interval_offsets = []
+        for start_offset, end_offset in interval_offsets:
+            if (
+                merged_interval_offsets
+                and start_offset <= merged_interval_offsets[-1][1]
+            ):
+                merged_interval_offsets[-1][1] = max(
+                    merged_interval_offsets[-1][1], end_offset
+                )
+            else:
+                merged_interval_offsets.append([start_offset, end_offset])
+
+        self.starts = array("q", (start for start, _end in merged_interval_offsets))
+        self.ends = array("q", (end for _start, end in merged_interval_offsets))
+        # Equal for schedules with equal intervals, so that they can be shared
+        self.key = (tuple(self.starts), tuple(self.ends))
+
+    def contains(self, week_offset: int) -> bool:
+        i = bisect_right(self.starts, week_offset) - 1
+        return i >= 0 and week_offset <= self.ends[i]
+
+    def contains_local_timestamp(self, local_timestamp: datetime) -> bool:
+        return self.contains(get_week_offset(local_timestamp))
@@ -6,7 +6,8 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from aas.alert.serializers import AlertSerializer
+from aas.alert.serializers import serialize_alerts
+from aas.alert.streaming import stream_alerts_response, streaming_requested
 from .models import Filter, NotificationProfile
 from .permissions import IsOwner
 from .serializers import (
@@ -48,8 +49,9 @@ def alerts_filtered_by_notification_profile_view(request, notification_profile_p
             f"Notification profile with pk={notification_profile_pk} does not exist."
         )
 
-    serializer = AlertSerializer(notification_profile.filtered_alerts, many=True)
-    return Response(serializer.data)
+    if streaming_requested(request):
+        return stream_alerts_response(notification_profile.filtered_alerts)
+    return Response(serialize_alerts(notification_profile.filtered_alerts))
 
 
 class TimeSlotList(generics.ListCreateAPIView):
@@ -100,5 +102,6 @@ def filter_preview_view(request):
 
     filter_string_json = json.dumps(filter_string_dict)
     mock_filter = Filter(filter_string=filter_string_json)
-    serializer = AlertSerializer(mock_filter.filtered_alerts, many=True)
-    return Response(serializer.data)
+    if streaming_requested(request):
+        return stream_alerts_response(mock_filter.filtered_alerts)
+    return Response(serialize_alerts(mock_filter.filtered_alerts))
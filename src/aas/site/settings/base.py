@@ -167,6 +167,57 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 NOTIFICATION_SUBJECT_PREFIX = "[AAS] "
 
+# Default and max number of alerts per page, when paginating alerts
+ALERT_PAGE_SIZE = 100
+ALERT_MAX_PAGE_SIZE = 1000
+# Number of alerts to fetch from the database at a time, when streaming alerts
+ALERT_STREAMING_CHUNK_SIZE = 500
+# Whether to serialize lists of alerts directly from database rows, instead of through `AlertSerializer`
+ALERT_FAST_SERIALIZATION = True
+
+# Max size in bytes of each JSON object and of the whole request body, when posting alerts
+ALERT_PARSER_MAX_OBJECT_SIZE = 1024 ** 2
+ALERT_PARSER_MAX_BODY_SIZE = 100 * 1024 ** 2
+# Number of posted alerts to create at a time
+ALERT_INGESTION_BATCH_SIZE = 1000
+
+# Max number of seconds before the in-memory table of network systems is reloaded,
+# to include changes made by other processes if the cache backend is not shared
+NETWORK_SYSTEM_TABLE_MAX_AGE = 60
+
+# Max number of objects per model to cache when looking up the problem types, objects, etc. of posted alerts
+ALERT_FOREIGN_KEY_CACHE_SIZE = get_int_env("AAS_ALERT_FOREIGN_KEY_CACHE_SIZE", 1000)
+
+# Max number of seconds before the in-memory index of notification profiles is rebuilt,
+# to include changes made by other processes if the cache backend is not shared
+NOTIFICATION_PROFILE_INDEX_MAX_AGE = get_int_env(
+    "AAS_NOTIFICATION_PROFILE_INDEX_MAX_AGE", 60
+)
+
+# Min number of alerts to match against the notification profiles in one database query, instead of one by one
+# through the in-memory index, when a notification worker has claimed that many new alerts.
+# The query reads the criterion tables of the filters, which must be in sync with the filter strings
+# (see the `rebuildfiltercriteria` management command)
+NOTIFICATION_SQL_MATCHING_MIN_ALERTS = get_int_env(
+    "AAS_NOTIFICATION_SQL_MATCHING_MIN_ALERTS", 50
+)
+
+# Queue of notifications, processed by the `runnotificationworkers` management command
+NOTIFICATION_QUEUE_MAX_ATTEMPTS = 5
+# Number of seconds before a failed job is retried; doubled for each failed attempt
+NOTIFICATION_QUEUE_RETRY_DELAY = 30
+NOTIFICATION_QUEUE_MAX_RETRY_DELAY = 60 * 60
+# Number of seconds before a job claimed by a worker is assumed to have been abandoned, and is retried
+NOTIFICATION_QUEUE_LEASE_TIME = 5 * 60
+NOTIFICATION_QUEUE_STATS_LOG_INTERVAL = 60
+# Number of seconds to wait before sending a notification, so that the notifications about other alerts
+# to the same user through the same medium during that time are sent in one digest; 0 sends them immediately
+NOTIFICATION_DIGEST_WINDOW = get_int_env("AAS_NOTIFICATION_DIGEST_WINDOW", 0)
+# Max number of seconds that a notification worker's connection to the mail server is kept open while not used
+NOTIFICATION_EMAIL_CONNECTION_MAX_IDLE = 60
+# Max number of rendered notification emails to cache, as the emails about the same alerts are equal for all recipients
+NOTIFICATION_EMAIL_RENDER_CACHE_SIZE = 100
+
 
 # 3rd party settings
 